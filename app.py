@@ -1,144 +1,214 @@
+import sys
+import threading
+import traceback
+
 import gradio as gr
-import pandas as pd
-import os
-from mlxtend.preprocessing import TransactionEncoder
-from mlxtend.frequent_patterns import apriori, association_rules
+import config
+import metrics
+from catalog import Catalog, badge_text
+from loader import encode_baskets, peak_memory_mb
+from model_store import build_model, load_or_build_model
+from model_worker import ModelHolder, ModelRefresher
+from persistence import StateJournal
+from personalization import Personalizer, blend
+from result_cache import ResultCache
+from session_store import LIST_KINDS, MemoryStore, make_store
+from topk_table import TopKServer
+
+
+catalog = Catalog.from_csv(config.PRODUCTS_PATH)
+
+
+# Why the first model could not be loaded, shown in the UI while the
+# placeholder model is served.
+load_error = None
+
+
+def initial_model():
+    # Loads the mined model from data/model/ and only re-mines when
+    # transactions.csv or the mining parameters change. If that fails for
+    # any reason, a tiny placeholder model (key None) is served so the UI
+    # stops waiting, and the refresher tries the real build again.
+    global load_error
+    try:
+        return load_or_build_model()
+    except Exception as e:
+        print(f"Model: could not load ({e!r}); serving a placeholder", file=sys.stderr)
+        traceback.print_exc()
+        load_error = e
+        refresher.retry()
+        return build_model(
+            encode_baskets([["Phone", "Phone Cover"], ["Phone", "Charger"]]),
+            config.MIN_SUPPORT, config.MIN_THRESHOLD, config.MINER, config.MAX_LEN,
+        )
 
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+# Handlers read `models.model` once per request. The first model loads on a
+# background thread (see below) so the server comes up straight away;
+# until `models.ready` is set, recommendation handlers say so instead of
+# blocking. The refresher re-mines in a child process when
+# transactions.csv changes and swaps the new model in; requests already
+# running finish on the model they started with.
+#
+# Handlers are plain functions: they query the session store, the journal
+# and the personalizer, all of which block, so Gradio runs them on its
+# worker threads instead of the event loop.
+models = ModelHolder()
+refresher = ModelRefresher(models)
+
+
+# Users and their liked/cart/recent lists live in the session store; each
+# browser session only carries its username in a gr.State, so concurrent
+# sessions never see each other's data.
+sessions = make_store(config.SESSION_STORE)
+
+# Likes, carts and popularity counters are written to data/state.db in
+# batches and replayed here, so they survive restarts. Badges keep reading
+# the in-memory catalog counters.
+journal = None
+if config.STATE_PATH:
+    journal = StateJournal(config.STATE_PATH, config.STATE_FLUSH_INTERVAL, config.STATE_FLUSH_SIZE)
+    journal.restore_catalog(catalog)
+    catalog.journal = journal
+    if isinstance(sessions, MemoryStore):
+        journal.restore_sessions(sessions)
+        sessions.journal = journal
+    journal.start()
+
+# Rendered recommendation cards keyed by (product or basket, k, model key).
+# A badge change drops every entry showing that product; a new model has a
+# new key, so stale entries just age out.
+results = ResultCache(config.RESULT_CACHE_SIZE, config.RESULT_CACHE_TTL)
+catalog.badge_listeners.append(results.invalidate_tag)
+models.listeners.append(lambda old, new: results.clear())
+
+# Single-product recommendations come from a top-k table precomputed per
+# model and memory-mapped (see topk_table.py). It is rebuilt in the
+# background after each model swap, and badge changes are patched into it.
+# With personalization on, each row is PERSONALIZATION_CANDIDATES wide so
+# the personalised path reads its rule candidates from the same record;
+# the plain path shows the first 4.
+topk = None
+if config.TOPK_TABLE:
+    topk = TopKServer(
+        catalog, k=max(4, config.PERSONALIZATION_CANDIDATES) if config.PERSONALIZATION_WEIGHT > 0 else 4,
+    )
+    models.listeners.append(topk.model_swapped)
+    catalog.badge_listeners.append(topk.badge_changed)
 
-products_df = pd.read_csv(os.path.join(DATA_DIR, "products.csv"))
-products_df["price"] = pd.to_numeric(products_df["price"], errors="coerce").fillna(999)
+if not sessions.has_user("admin"):
+    sessions.set_user("admin", "admin")
 
-if "liked_count" not in products_df.columns:
-    products_df["liked_count"] = 1200
-if "cart_count" not in products_df.columns:
-    products_df["cart_count"] = 800
+# Item-item similarity from everyone's liked/cart/recent lists, blended into
+# single-product recommendations. Clicks are recorded as they happen; the
+# neighbor table is refreshed from the changed users every few seconds.
+personalizer = Personalizer(top_n=config.PERSONALIZATION_TOP_N)
+for _user in sessions.users():
+    for _kind in LIST_KINDS:
+        for _product in sessions.get_list(_user, _kind):
+            personalizer.record(_user, _kind, _product)
 
+metrics.gauge("rules", lambda: models.model.stats.get("rules"))
+metrics.gauge("model_bytes", lambda: models.model.memory_usage())
+metrics.gauge("result_cache", results.stats)
+metrics.gauge("peak_memory_mb", peak_memory_mb)
+models.listeners.append(lambda old, new: metrics.count("model_swaps"))
+metrics.gauge("model_ready", lambda: int(models.ready.is_set()))
+metrics.gauge("topk_table", lambda: {
+    "ready": int(topk is not None and topk.table is not None and models.model is not None
+                 and topk.table.key == models.model.key),
+    "bytes": topk.table.nbytes if topk is not None and topk.table is not None else 0,
+})
+metrics.gauge("personalization", lambda: {
+    "users": len(personalizer), "products": len(personalizer.names), "pending_users": personalizer.pending,
+})
 
-transactions = []
-try:
-    with open(os.path.join(DATA_DIR, "transactions.csv"), "r", encoding="utf-8") as f:
-        for line in f:
-            items = [i.strip() for i in line.split(",") if i.strip()]
-            if items:
-                transactions.append(items)
-except:
-    transactions = [["Phone", "Phone Cover"], ["Phone", "Charger"]]
 
-te = TransactionEncoder()
-encoded = te.fit(transactions).transform(transactions)
-df_encoded = pd.DataFrame(encoded, columns=te.columns_)
-freq_items = apriori(df_encoded, min_support=0.001, use_colnames=True)
-rules = association_rules(freq_items, metric="confidence", min_threshold=0.01)
+def load_in_background():
+    models.swap(initial_model())
+    personalizer.refresh()
+    personalizer.start(config.PERSONALIZATION_REFRESH)
 
 
-USERS = {"admin": "admin"}
-current_user = None
-user_liked = {}
-user_cart = {}
-user_recent = {}
+threading.Thread(target=load_in_background, name="model-loader", daemon=True).start()
 
 
-def profile_display():
-    return f"**👤 Username:** {current_user}"
+def profile_display(user):
+    return f"**👤 Username:** {user}"
 
-def liked_count_display():
-    return f"❤️ {len(user_liked.get(current_user, []))} items"
+def liked_count_display(user):
+    return f"❤️ {sessions.count(user, 'liked')} items"
 
-def cart_count_display():
-    return f"🛒 {len(user_cart.get(current_user, []))} items"
+def cart_count_display(user):
+    return f"🛒 {sessions.count(user, 'cart')} items"
 
 
-def login(un, pw):
-    global current_user
-    if un in USERS and USERS[un] == pw:
-        current_user = un
-        user_liked.setdefault(un, [])
-        user_cart.setdefault(un, [])
-        user_recent.setdefault(un, [])
+def login(un, pw, user=None):
+    if sessions.check_password(un, pw):
         return (
             gr.update(visible=False),
             gr.update(visible=True),
-            profile_display(),
-            liked_count_display(),
-            cart_count_display(),
-            ""
+            profile_display(un),
+            liked_count_display(un),
+            cart_count_display(un),
+            "",
+            un,
         )
-    return gr.update(), gr.update(), "", "", "", "❌ Invalid credentials"
+    return gr.update(), gr.update(), "", "", "", "❌ Invalid credentials", user
 
 def signup(un, pw):
-    global current_user
-    USERS[un] = pw
-    current_user = un
-    user_liked[un] = []
-    user_cart[un] = []
-    user_recent[un] = []
+    sessions.set_user(un, pw)
+    personalizer.reset_user(un)
     return (
         gr.update(visible=False),
         gr.update(visible=True),
-        profile_display(),
-        liked_count_display(),
-        cart_count_display(),
-        ""
+        profile_display(un),
+        liked_count_display(un),
+        cart_count_display(un),
+        "",
+        un,
     )
 
 def logout():
-    global current_user
-    current_user = None
-    return gr.update(visible=True), gr.update(visible=False), "", "", "", ""
-
-def like_product(product):
-    if product not in user_liked[current_user]:
-        user_liked[current_user].append(product)
-        products_df.loc[
-            products_df["product_name"] == product, "liked_count"
-        ] += 1
-    return liked_count_display(), cart_count_display()
+    return gr.update(visible=True), gr.update(visible=False), "", "", "", "", None
 
-def cart_product(product):
-    if product not in user_cart[current_user]:
-        user_cart[current_user].append(product)
-        products_df.loc[
-            products_df["product_name"] == product, "cart_count"
-        ] += 1
-    return liked_count_display(), cart_count_display()
+def like_product(product, user):
+    if sessions.add_item(user, "liked", product):
+        catalog.increment(product, "liked_count")
+        personalizer.record(user, "liked", product)
+    return liked_count_display(user), cart_count_display(user)
 
+def cart_product(product, user):
+    if sessions.add_item(user, "cart", product):
+        catalog.increment(product, "cart_count")
+        personalizer.record(user, "cart", product)
+    return liked_count_display(user), cart_count_display(user)
 
-    return liked_count_display(), cart_count_display()
 
 
-
-def format_gallery_item(row, badge_text=""):
-    
-    label = f"{row['product_name']} | ₹{int(row['price'])}"
-    if badge_text:
-        label += f" ({badge_text})"
-    return (row['image_url'], label)
-
 def get_product_details(product_name):
     
-    row = products_df[products_df["product_name"] == product_name].iloc[0]
+    row = catalog.get(product_name)
     desc = f"Experience the premium quality of {product_name}. Perfect for your daily needs."
     stats = f"""
-    *   **❤️ Liked by:** {int(row['liked_count'])} users
-    *   **🛒 Added to cart by:** {int(row['cart_count'])} users
+    *   **❤️ Liked by:** {int(row.liked_count)} users
+    *   **🛒 Added to cart by:** {int(row.cart_count)} users
     """
     
     return (
-        row['image_url'], 
+        row.image_url, 
         f"## {product_name}", 
-        f"### ₹{int(row['price'])}", 
+        f"### ₹{int(row.price)}", 
         desc, 
         stats
     )
 
-def liked_dashboard():
+def liked_dashboard(user):
     # Helper to return updates
     def clear_main(): return gr.update(visible=False, value=[])
     
-    if not user_liked.get(current_user):
+    liked = sessions.get_list(user, "liked")
+    if not liked:
         msg = """
         <div style='text-align:center; padding:100px 20px;'>
             <h2 style='font-size: 2em; margin-bottom: 20px;'>💔 No Liked Products Yet</h2>
@@ -151,19 +221,19 @@ def liked_dashboard():
     gallery_data = []
     product_list = []
     
-    for p in user_liked.get(current_user, []):
+    for p in liked:
         if p in product_list: continue 
-        row = products_df[products_df["product_name"] == p].iloc[0]
-        gallery_data.append(format_gallery_item(row, "❤️ Liked"))
+        gallery_data.append(catalog.gallery_item(p, "❤️ Liked"))
         product_list.append(p)
         
     # Show Secondary, Hide Main
     return clear_main(), gr.update(visible=True, value=gallery_data), product_list, gr.update(visible=False), gr.update(visible=False), gr.update(visible=False, value="")
 
-def cart_dashboard():
+def cart_dashboard(user):
     def clear_main(): return gr.update(visible=False, value=[])
 
-    if not user_cart.get(current_user):
+    cart = sessions.get_list(user, "cart")
+    if not cart:
         msg = """
         <div style='text-align:center; padding:100px 20px;'>
             <h2 style='font-size: 2em; margin-bottom: 20px;'>🛒 Your Cart is Empty</h2>
@@ -174,18 +244,17 @@ def cart_dashboard():
     
     gallery_data = []
     product_list = []
-    for p in user_cart.get(current_user, []):
+    for p in cart:
         if p in product_list: continue
-        row = products_df[products_df["product_name"] == p].iloc[0]
-        gallery_data.append(format_gallery_item(row, "🛒 In Cart"))
+        gallery_data.append(catalog.gallery_item(p, "🛒 In Cart"))
         product_list.append(p)
         
     return clear_main(), gr.update(visible=True, value=gallery_data), product_list, gr.update(visible=False), gr.update(visible=False), gr.update(visible=False, value="")
 
-def recent_dashboard():
+def recent_dashboard(user):
     def clear_main(): return gr.update(visible=False, value=[])
     
-    recent_items = user_recent.get(current_user, [])[::-1]
+    recent_items = sessions.get_list(user, "recent")[::-1]
     
     if not recent_items:
         return clear_main(), gr.update(visible=False, value=[]), [], gr.update(visible=False), gr.update(visible=False), gr.update(visible=True, value="<div style='text-align:center'>No history</div>")
@@ -196,8 +265,7 @@ def recent_dashboard():
     for p in recent_items:
         if p in seen: continue
         seen.add(p)
-        row = products_df[products_df["product_name"] == p].iloc[0]
-        gallery_data.append(format_gallery_item(row, "🕒 Recent"))
+        gallery_data.append(catalog.gallery_item(p, "🕒 Recent"))
         product_list.append(p)
         
     return clear_main(), gr.update(visible=True, value=gallery_data), product_list, gr.update(visible=False), gr.update(visible=False), gr.update(visible=False, value="")
@@ -214,61 +282,128 @@ def home_dashboard():
     )
 
 
-def recommend(product):
+def recommend(product, user=None):
     # Show Main, Hide Secondary
+    if not product:
+        return render_recommendations(None)
+
+    if user:
+        sessions.add_item(user, "recent", product)
+        personalizer.record(user, "recent", product)
+
+
+    model = models.model
+    if model is None:
+        return model_loading()
+
+    table = topk.table if topk is not None else None
+    if table is not None and (table.key != model.key or product not in table.ids):
+        table = None  # still the previous model's table, or a product it does not cover
+    metrics.count("topk_hits" if table is not None else "topk_misses")
+
+    personal = personalizer.scores(user) if user and config.PERSONALIZATION_WEIGHT > 0 else None
+    if personal:
+        # Only the blend is per user: the rule candidates come from the
+        # top-k table record, or from the result cache until the table is in.
+        with metrics.timed("recommend_personal"):
+            k = config.PERSONALIZATION_CANDIDATES
+            if table is not None:
+                names, scores, _ = table.row(product)
+                candidates = list(zip(names[:k], scores[:k]))
+            else:
+                candidates = results.get_or_compute(
+                    ("candidates", product, k, model.key), lambda: model.rec_index.lookup(product, k=k),
+                )
+            top_recs = blend(candidates, personal, config.PERSONALIZATION_WEIGHT, k=4, exclude={product})
+            return render_recommendations(render_cards(top_recs))
+
+    if table is not None:
+        with metrics.timed("recommend_topk"):
+            return render_recommendations(topk_cards(table, product))
+
+    def compute():
+        with metrics.timed("rec_lookup"):
+            top_recs = model.rec_index.lookup(product, k=4)
+        return render_cards(top_recs)
+
+    with metrics.timed("recommend"):
+        return render_recommendations(results.get_or_compute(("product", product, 4, model.key), compute, _card_names))
+
+
+def recommend_for_cart(user, agg="max"):
+    # Recommendations for the whole cart: every rule whose antecedent is
+    # contained in the cart counts, and cart items themselves are skipped.
+    basket = sessions.get_list(user, "cart")
+    if not basket:
+        return gr.update(visible=True, value=[]), gr.update(visible=False), [], gr.update(visible=True), gr.update(visible=False), gr.update(visible=True, value="<div style='text-align:center'>Add items to your cart to get cart recommendations</div>")
+    model = models.model
+    if model is None:
+        return model_loading()
+    key = ("basket", tuple(sorted(set(basket))), 4, agg, model.key)
+
+    def compute():
+        with metrics.timed("basket_score"):
+            top_recs = model.basket_scorer.recommend(basket, k=4, agg=agg)
+        return render_cards(top_recs)
+
+    with metrics.timed("recommend_for_cart"):
+        return render_recommendations(results.get_or_compute(key, compute, _card_names))
+
+
+def model_loading():
+    return gr.update(visible=True, value=[]), gr.update(visible=False), [], gr.update(visible=True), gr.update(visible=False), gr.update(visible=True, value="<div style='text-align:center'>⏳ Recommendations are still loading, try again in a moment</div>")
+
+
+def model_status():
+    # Polled by the UI until the first real model is in; then the timer
+    # stops. While the placeholder is served, the load error is shown.
+    if not models.ready.is_set():
+        return gr.update(value="⏳ Loading recommendations…", visible=True), gr.Timer(active=True)
+    if models.model.key is None:
+        error = refresher.last_error or load_error
+        return gr.update(value=f"⚠️ Recommendations are limited, the model failed to load: {error}", visible=True), gr.Timer(active=True)
+    return gr.update(value="", visible=False), gr.Timer(active=False)
+
+
+def render_cards(top_recs):
+    # (gallery items, product names) for a ranked list, or None when there
+    # is nothing to show. Cached in `results`, so it must stay a pure
+    # function of the recommendations and the products' badges.
+    if not top_recs:
+        return None
+
+    gallery_data = []
+    product_list = []
     
-    if current_user:
-        if current_user not in user_recent:
-            user_recent[current_user] = []
-        user_recent[current_user].append(product)
+    with metrics.timed("render_cards"):
+        for name, conf in top_recs:
+            if name not in catalog: continue
+            gallery_data.append(catalog.gallery_item(name, catalog.badge(name)))
+            product_list.append(name)
+    return gallery_data, product_list
 
 
-    recs_map = {}
-    
-    for _, r in rules.iterrows():
-        
-        target_products = []
-        trigger = ""
-        conf = r["confidence"]
-        
-        if product in r["antecedents"]:
-            target_products = list(r["consequents"])
-            trigger = product 
-        elif product in r["consequents"]:
-            target_products = list(r["antecedents"])
-            trigger = product 
+def topk_cards(table, product, k=4):
+    # render_cards() output straight from the first k entries of a top-k
+    # table row; the badges are the row's flags.
+    names, _, flags = table.row(product)
+    if not names:
+        return None
+    names = names[:k]
+    return [catalog.gallery_item(n, badge_text(f)) for n, f in zip(names, flags)], names
 
-        for p in target_products:
-            if p == product: continue
-            if p not in recs_map or conf > recs_map[p]['confidence']:
-                recs_map[p] = {'confidence': conf, 'trigger': trigger}
 
+def _card_names(cards):
+    return cards[1] if cards else ()
 
-    sorted_recs = sorted(recs_map.items(), key=lambda x: x[1]['confidence'], reverse=True)
-    top_recs = sorted_recs[:4]
-    
-    if not top_recs:
+
+def render_recommendations(cards):
+    if cards is None:
         # gallery_main, gallery_secondary, current_products_state, input_group, detail_view, empty_msg
         return gr.update(visible=True, value=[]), gr.update(visible=False), [], gr.update(visible=True), gr.update(visible=False), gr.update(visible=True, value="<div style='text-align:center'>No recommendations found</div>")
 
-    gallery_data = []
-    product_list = []
-    
-    for name, info in top_recs:
-        row_matches = products_df[products_df["product_name"] == name]
-        if row_matches.empty: continue
-        row = row_matches.iloc[0]
-        
-        
-        badges = []
-        if row['liked_count'] > 1000: badges.append("❤️ Hot")
-        if row['cart_count'] > 800: badges.append("🔥 Popular")
-        badge_str = " ".join(badges)
-        
-        gallery_data.append(format_gallery_item(row, badge_str))
-        product_list.append(name)
-        
-    return gr.update(visible=True, value=gallery_data), gr.update(visible=False), product_list, gr.update(visible=True), gr.update(visible=False), gr.update(visible=False, value="") 
+    gallery_data, product_list = cards
+    return gr.update(visible=True, value=list(gallery_data)), gr.update(visible=False), list(product_list), gr.update(visible=True), gr.update(visible=False), gr.update(visible=False, value="") 
 
 
 def on_select(evt: gr.SelectData, product_list):
@@ -295,11 +430,11 @@ def back_to_results():
     # Let's assume Back -> Home/Main for now, or just show the Main gallery.
     return gr.update(visible=True), gr.update(visible=False), gr.update(visible=False)
 
-def like_from_detail(product):
-    return like_product(product)
+def like_from_detail(product, user):
+    return like_product(product, user)
 
-def cart_from_detail(product):
-    return cart_product(product) 
+def cart_from_detail(product, user):
+    return cart_product(product, user) 
 
 
 CSS = """
@@ -468,6 +603,7 @@ button[aria-label="Share"],
 with gr.Blocks(theme=gr.themes.Soft()) as app:
     current_products_state = gr.State([])
     selected_product_state = gr.State("")
+    user_state = gr.State(None)
 
    
     with gr.Row(visible=True) as login_view:
@@ -503,8 +639,10 @@ with gr.Blocks(theme=gr.themes.Soft()) as app:
         with gr.Column(scale=3):
            
             with gr.Column(visible=True) as input_group:
-                dropdown = gr.Dropdown(products_df["product_name"].tolist(), label="Select Product")
+                dropdown = gr.Dropdown(catalog.names, label="Select Product")
+                status_md = gr.Markdown("⏳ Loading recommendations…")
                 rec_btn = gr.Button("Get Recommendations")
+                cart_rec_btn = gr.Button("🛍️ Recommend for My Cart")
             
             # --- MAIN GALLERY (Large cards) ---
             gallery_main = gr.Gallery(
@@ -547,9 +685,9 @@ with gr.Blocks(theme=gr.themes.Soft()) as app:
                             detail_cart_btn = gr.Button("🛒 Add to Cart", variant="primary")
 
    
-    login_btn.click(login, [un, pw], [login_view, main_view, profile, liked_count, cart_count, status])
-    signup_btn.click(signup, [un, pw], [login_view, main_view, profile, liked_count, cart_count, status])
-    logout_btn.click(logout, outputs=[login_view, main_view, profile, liked_count, cart_count, status])
+    login_btn.click(login, [un, pw, user_state], [login_view, main_view, profile, liked_count, cart_count, status, user_state])
+    signup_btn.click(signup, [un, pw], [login_view, main_view, profile, liked_count, cart_count, status, user_state])
+    logout_btn.click(logout, outputs=[login_view, main_view, profile, liked_count, cart_count, status, user_state])
 
     # NOTE: Output order must match functions!
     # home_dashboard: gallery_main, gallery_secondary, detail_view, empty_msg, input_group
@@ -561,23 +699,35 @@ with gr.Blocks(theme=gr.themes.Soft()) as app:
     # liked, cart, recent: gallery_main, gallery_secondary, current_products, input_group, detail_view, empty_msg
     liked_btn.click(
         liked_dashboard, 
+        inputs=[user_state],
         outputs=[gallery_main, gallery_secondary, current_products_state, input_group, detail_view, empty_msg]
     )
     cart_btn.click(
         cart_dashboard, 
+        inputs=[user_state],
         outputs=[gallery_main, gallery_secondary, current_products_state, input_group, detail_view, empty_msg]
     )
     recent_btn.click(
         recent_dashboard, 
+        inputs=[user_state],
         outputs=[gallery_main, gallery_secondary, current_products_state, input_group, detail_view, empty_msg]
     )
 
     # recommend: gallery_main, gallery_secondary, current_products, input_group, detail_view, empty_msg
     rec_btn.click(
         recommend, 
-        inputs=[dropdown], 
+        inputs=[dropdown, user_state], 
         outputs=[gallery_main, gallery_secondary, current_products_state, input_group, detail_view, empty_msg]
     )
+    cart_rec_btn.click(
+        recommend_for_cart,
+        inputs=[user_state],
+        outputs=[gallery_main, gallery_secondary, current_products_state, input_group, detail_view, empty_msg]
+    )
+
+    status_timer = gr.Timer(1.0)
+    status_timer.tick(model_status, outputs=[status_md, status_timer])
+    app.load(model_status, outputs=[status_md, status_timer])
 
     # Select handlers: Need ONE for each gallery
     gallery_main.select(
@@ -593,8 +743,21 @@ with gr.Blocks(theme=gr.themes.Soft()) as app:
     )
 
     back_btn.click(back_to_results, outputs=[gallery_main, gallery_secondary, detail_view])
-    detail_like_btn.click(like_from_detail, selected_product_state, [liked_count, cart_count])
-    detail_cart_btn.click(cart_from_detail, selected_product_state, [liked_count, cart_count])
+    detail_like_btn.click(like_from_detail, [selected_product_state, user_state], [liked_count, cart_count])
+    detail_cart_btn.click(cart_from_detail, [selected_product_state, user_state], [liked_count, cart_count])
 
 if __name__ == "__main__":
+    def report(old, new):
+        print("Model ready:", ", ".join(f"{k}={v}" for k, v in new.stats.items()))
+
+    models.listeners.append(report)
+    if models.ready.is_set():
+        report(None, models.model)
+    else:
+        print("Model: loading in the background")
+    refresher.start()
+    if config.METRICS_PORT:
+        metrics.serve(config.METRICS_PORT)
+        print(f"Metrics: http://127.0.0.1:{config.METRICS_PORT}/metrics (JSON at /metrics.json)")
+    app.queue(default_concurrency_limit=config.CONCURRENCY_LIMIT)
     app.launch(css=CSS, allowed_paths=["."], share=True)
@@ -0,0 +1,151 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+import config
+from catalog import Catalog
+from loader import parse_baskets
+from model_store import load_model, load_or_build_model
+
+COLUMNS = ["query", "rank", "product", "score", "confidence", "lift"]
+
+
+def recommend_products(model, products, k=4, catalog=None):
+    # Top-k for each product, ranked exactly like the app's recommend().
+    # Like the app, recommendations missing from `catalog` (product names,
+    # e.g. Catalog.names) are dropped after taking the top k; without a
+    # catalog the output is unfiltered.
+    index = model.rec_index
+    q, targets, scores, conf, lifts = index.lookup_many(products, k)
+    return _frame(products, q, [index.names[t] for t in targets], scores, conf, lifts, catalog)
+
+
+def recommend_baskets(model, baskets, k=4, agg="max", chunk_size=10_000, catalog=None):
+    # Top-k for each basket (a list of product names), scored like
+    # recommend_for_cart(), `catalog` filtering as above. Baskets are
+    # scored chunk_size at a time.
+    scorer = model.basket_scorer
+    frames = []
+    for lo in range(0, len(baskets), chunk_size):
+        chunk = baskets[lo:lo + chunk_size]
+        indices, indptr = [], [0]
+        for basket in chunk:
+            indices.extend({scorer.ids[p] for p in basket if p in scorer.ids})
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), indices, indptr),
+            shape=(len(chunk), len(scorer.names)),
+        )
+        rows, items, scores, conf, lift = scorer.recommend_many(matrix, k, agg)
+        queries = [",".join(b) for b in chunk]
+        frames.append(_frame(queries, rows, [scorer.names[i] for i in items], scores, conf, lift, catalog))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+
+
+def _frame(queries, q, products, scores, conf, lift, catalog=None):
+    q = np.asarray(q, dtype=np.int64)
+    if catalog is not None:
+        keep = np.fromiter((p in catalog for p in products), dtype=bool, count=len(products))
+        q, scores, conf, lift = q[keep], np.asarray(scores)[keep], np.asarray(conf)[keep], np.asarray(lift)[keep]
+        products = [p for p, k in zip(products, keep) if k]
+    first = np.r_[0, np.flatnonzero(q[1:] != q[:-1]) + 1] if len(q) else np.zeros(0, dtype=np.int64)
+    rank = np.arange(len(q)) - np.repeat(first, np.diff(np.r_[first, len(q)])) + 1
+    return pd.DataFrame({
+        "query": [queries[i] for i in q],
+        "rank": rank,
+        "product": products,
+        "score": scores,
+        "confidence": conf,
+        "lift": lift,
+    }, columns=COLUMNS)
+
+
+# Worker processes memory-map the same on-disk artifact instead of
+# receiving a pickled copy of the model.
+_worker_model = None
+_worker_catalog = None
+
+
+def _init_worker(root, key, catalog):
+    global _worker_model, _worker_catalog
+    _worker_model = load_model(key, root)
+    _worker_catalog = catalog
+
+
+def _run_chunk(kind, chunk, k, agg):
+    return _run_in_process(_worker_model, kind, chunk, k, agg, _worker_catalog)
+
+
+def run_batch(kind, queries, k=4, agg="max", workers=1, root=config.MODEL_DIR, model=None, catalog=None):
+    model = model or load_or_build_model(root=root)
+    catalog = None if catalog is None else frozenset(catalog)
+    if workers <= 1 or len(queries) < 2 * workers or not os.path.isdir(os.path.join(root, str(model.key))):
+        return _run_in_process(model, kind, queries, k, agg, catalog)
+
+    size = -(-len(queries) // (workers * 4))
+    chunks = [queries[i:i + size] for i in range(0, len(queries), size)]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(root, model.key, catalog)) as pool:
+        frames = list(pool.map(_run_chunk, [kind] * len(chunks), chunks, [k] * len(chunks), [agg] * len(chunks)))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _run_in_process(model, kind, queries, k, agg, catalog=None):
+    if kind == "products":
+        return recommend_products(model, queries, k, catalog)
+    return recommend_baskets(model, queries, k, agg, catalog=catalog)
+
+
+def read_queries(kind, path):
+    with open(path, "r", encoding="utf-8") as f:
+        if kind == "products":
+            return [line.strip() for line in f if line.strip()]
+        return list(parse_baskets(f))
+
+
+def check_output(path):
+    # Parquet output needs pyarrow (or fastparquet); say so before the
+    # batch runs rather than after.
+    import importlib.util
+
+    if path.endswith(".parquet") and not any(importlib.util.find_spec(m) for m in ("pyarrow", "fastparquet")):
+        raise ImportError("writing Parquet output needs pyarrow (pip install pyarrow), or use a .csv output")
+
+
+def write_results(frame, path):
+    if path.endswith(".parquet"):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute top-k recommendations for products or baskets.")
+    parser.add_argument("kind", choices=["products", "baskets"], help="one product per line, or comma-separated baskets")
+    parser.add_argument("input")
+    parser.add_argument("output", help=".csv or .parquet")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--agg", choices=["max", "sum", "lift"], default="max", help="basket score aggregation")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--model-dir", default=config.MODEL_DIR)
+    parser.add_argument("--products", default=config.PRODUCTS_PATH, help="catalog the recommendations are limited to")
+    parser.add_argument("--all-products", action="store_true", help="keep recommendations missing from the catalog")
+    args = parser.parse_args(argv)
+
+    check_output(args.output)
+    catalog = None if args.all_products else Catalog.from_csv(args.products).names
+    queries = read_queries(args.kind, args.input)
+    start = time.perf_counter()
+    frame = run_batch(args.kind, queries, args.k, args.agg, args.workers, args.model_dir, catalog=catalog)
+    elapsed = time.perf_counter() - start
+    write_results(frame, args.output)
+    rate = len(queries) / elapsed if elapsed else float("inf")
+    print(f"{len(queries)} {args.kind} -> {len(frame)} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
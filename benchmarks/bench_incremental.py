@@ -0,0 +1,48 @@
+import argparse
+import time
+
+from benchmarks.synthetic import generate_baskets
+from incremental import IncrementalMiner
+from loader import encode_baskets
+from model_store import build_model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental refresh vs. full re-mining latency.")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--baskets", type=int, default=100_000)
+    parser.add_argument("--batch", type=int, default=1_000, help="baskets appended per refresh")
+    parser.add_argument("--batches", type=int, default=5)
+    parser.add_argument("--min-support", type=float, default=0.002)
+    parser.add_argument("--min-threshold", type=float, default=0.05)
+    parser.add_argument("--max-len", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    total = args.baskets + args.batch * args.batches
+    data = generate_baskets(args.products, total, seed=args.seed)
+
+    start = time.perf_counter()
+    miner = IncrementalMiner(encode_baskets(data[:args.baskets]), args.min_support, args.min_threshold, args.max_len)
+    print(f"initial mine of {args.baskets} baskets: {time.perf_counter() - start:.2f}s, {len(miner.rules)} rules")
+    print(f"{'baskets':>10} {'incremental':>12} {'full':>10} {'speedup':>8} {'products refreshed':>19}")
+
+    for b in range(args.batches):
+        lo = args.baskets + b * args.batch
+        hi = lo + args.batch
+
+        start = time.perf_counter()
+        affected = miner.add_baskets(data[lo:hi])
+        t_inc = time.perf_counter() - start
+
+        start = time.perf_counter()
+        full = build_model(encode_baskets(data[:hi]), args.min_support, args.min_threshold, "auto", args.max_len)
+        t_full = time.perf_counter() - start
+
+        if len(full.freq_items) != len(miner.freq_items):
+            raise SystemExit("incremental itemsets diverged from a full re-mine")
+        print(f"{hi:>10} {t_inc:>11.3f}s {t_full:>9.3f}s {t_full / t_inc:>7.1f}x {len(affected):>19}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import generate_baskets, product_names, write_transactions
+from loader import load_baskets, peak_memory_mb, read_order_lines
+
+
+def write_order_lines(path, baskets, ids, unknown=0.0, shuffle=False, seed=0):
+    # The same baskets as (order_id, product_id) rows, grouped by order
+    # like most exports unless shuffled. A share of rows points at product
+    # ids missing from products.csv.
+    rng = np.random.default_rng(seed)
+    sizes = np.fromiter((len(b) for b in baskets), dtype=np.int64, count=len(baskets))
+    order = np.repeat(np.arange(1, len(baskets) + 1, dtype=np.int64), sizes)
+    product = np.fromiter((ids[p] for b in baskets for p in b), dtype=np.int64, count=int(sizes.sum()))
+    n_unknown = int(len(order) * unknown)
+    if n_unknown:
+        order = np.r_[order, rng.integers(1, len(baskets) + 1, size=n_unknown)]
+        product = np.r_[product, len(ids) + 1 + rng.integers(0, 1000, size=n_unknown)]
+    if shuffle or n_unknown:
+        perm = rng.permutation(len(order)) if shuffle else np.argsort(order, kind="stable")
+        order, product = order[perm], product[perm]
+    frame = pd.DataFrame({"order_id": order, "product_id": product})
+    if path.endswith(".parquet"):
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+    return len(frame)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Order-line ingestion throughput vs. the comma-per-basket loader.")
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--baskets", type=int, default=1_000_000)
+    parser.add_argument("--unknown", type=float, default=0.01, help="share of rows with unknown product ids")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    names = product_names(args.products)
+    ids = {n: i + 1 for i, n in enumerate(names)}
+    baskets = generate_baskets(args.products, args.baskets, seed=args.seed)
+    formats = ["csv", "csv (shuffled)"]
+    try:
+        import pyarrow  # noqa: F401
+
+        formats.append("parquet")
+    except ImportError:
+        print("pyarrow not installed: skipping Parquet")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        products = os.path.join(tmp, "products.csv")
+        pd.DataFrame({"product_id": list(ids.values()), "product_name": names}).to_csv(products, index=False)
+        transactions = os.path.join(tmp, "transactions.csv")
+        write_transactions(transactions, baskets)
+        start = time.perf_counter()
+        reference = load_baskets(transactions)
+        t_lines = time.perf_counter() - start
+        rows = int(reference.matrix.nnz)
+        print(f"{len(baskets):,} baskets, {rows:,} order lines, {args.products:,} products")
+        print(f"  {'transactions.csv':<16} {t_lines:>7.2f}s {rows / t_lines:>12,.0f} rows/s")
+
+        for fmt in formats:
+            path = os.path.join(tmp, "orders.parquet" if fmt == "parquet" else f"orders{len(fmt)}.csv")
+            written = write_order_lines(path, baskets, ids, args.unknown, shuffle="shuffled" in fmt, seed=args.seed)
+            for min_size in (1, 2):
+                got, r = read_order_lines(path, products, min_size=min_size, chunk_rows=args.chunk_rows)
+                if min_size == 1:
+                    same = got.items == reference.items and (got.matrix != reference.matrix).nnz == 0
+                    assert same, "order lines and transactions.csv disagree"
+                print(f"  {fmt:<16} {r['seconds']:>7.2f}s {r['rows_per_sec']:>12,.0f} rows/s  "
+                      f"min_size={min_size}: {written:,} rows, {r['dropped_rows']:,} dropped, "
+                      f"{r['tiny_orders']:,} tiny orders, {len(got):,} baskets")
+    print(f"  peak memory {peak_memory_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
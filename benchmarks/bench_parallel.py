@@ -0,0 +1,46 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from benchmarks.synthetic import generate_baskets
+from loader import encode_baskets
+from mining import choose_miner, mine_frequent_itemsets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SON parallel mining speedup vs. worker count.")
+    parser.add_argument("--products", type=int, default=1_000)
+    parser.add_argument("--baskets", type=int, default=500_000)
+    parser.add_argument("--min-support", type=float, default=0.001)
+    parser.add_argument("--max-len", type=int, default=3)
+    parser.add_argument("--miner", default="auto")
+    parser.add_argument("--workers", type=int, nargs="*", help="worker counts to try (default: 1, 2, 4, ... up to the CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    cpus = os.cpu_count() or 1
+    counts = args.workers or sorted({min(2 ** i, cpus) for i in range(cpus.bit_length() + 1)} | {cpus})
+    baskets = encode_baskets(generate_baskets(args.products, args.baskets, seed=args.seed))
+    miner = choose_miner(baskets, args.min_support) if args.miner == "auto" else args.miner
+    print(f"{len(baskets)} baskets, {len(baskets.items)} products, miner={miner}, {cpus} CPUs")
+
+    start = time.perf_counter()
+    serial = mine_frequent_itemsets(baskets, args.min_support, miner, args.max_len)
+    t_serial = time.perf_counter() - start
+    print(f"{'workers':>8} {'seconds':>9} {'speedup':>8}")
+    print(f"{'serial':>8} {t_serial:>9.2f} {1.0:>7.2f}x   ({len(serial)} itemsets)")
+
+    for workers in counts:
+        if workers < 2:
+            continue
+        start = time.perf_counter()
+        result = mine_frequent_itemsets(baskets, args.min_support, miner, args.max_len, workers=workers)
+        elapsed = time.perf_counter() - start
+        pd.testing.assert_frame_equal(result, serial)
+        print(f"{workers:>8} {elapsed:>9.2f} {t_serial / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
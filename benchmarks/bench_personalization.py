@@ -0,0 +1,50 @@
+import argparse
+import random
+import time
+
+from benchmarks.synthetic import generate_baskets
+from personalization import Personalizer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Personalizer refresh and scoring cost as the user count grows.")
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--users", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    parser.add_argument("--batch", type=int, default=1_000, help="users active between two refreshes")
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    kinds = ("recent", "liked", "cart")
+    histories = generate_baskets(args.products, max(args.users) + args.batch, seed=args.seed)
+    rng = random.Random(args.seed)
+    print(f"{'users':>9} {'bulk load':>10} {'refresh':>9} {'rows redone':>12} {'scores p50':>11}")
+
+    for n_users in args.users:
+        p = Personalizer(top_n=args.top_n)
+        start = time.perf_counter()
+        for u in range(n_users):
+            for product in histories[u]:
+                p.record(u, rng.choice(kinds), product)
+        p.refresh()
+        bulk = time.perf_counter() - start
+
+        # One refresh interval's worth of activity from `batch` users.
+        for u in range(n_users, n_users + args.batch):
+            for product in histories[u]:
+                p.record(u, rng.choice(kinds), product)
+        start = time.perf_counter()
+        redone = p.refresh()
+        refresh = time.perf_counter() - start
+
+        latencies = []
+        for u in rng.sample(range(n_users), 1000):
+            start = time.perf_counter()
+            p.scores(u)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"{n_users:>9} {bulk:>9.2f}s {refresh:>8.3f}s {redone:>12} {latencies[len(latencies) // 2] * 1e6:>9.0f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.synthetic import generate_baskets
+from loader import encode_baskets
+from mining import choose_miner, mine_frequent_itemsets
+from recommender import build_basket_scorer, build_rec_index
+
+
+def timed(stages, name, fn, *args, **kwargs):
+    # Runs one stage, recording wall time and the peak Python/NumPy
+    # allocation (via tracemalloc) while it ran.
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - base
+    stages[name] = {"seconds": round(elapsed, 6), "peak_mb": round(peak / 2**20, 3)}
+    return result
+
+
+def latency(fn, queries):
+    # tracemalloc would dominate sub-millisecond calls, so pause it.
+    tracing = tracemalloc.is_tracing()
+    tracemalloc.stop()
+    samples = np.empty(len(queries))
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        fn(q)
+        samples[i] = time.perf_counter() - start
+    samples *= 1000
+    if tracing:
+        tracemalloc.start()
+    return {
+        "calls": len(queries),
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p99_ms": round(float(np.percentile(samples, 99)), 4),
+        "max_ms": round(float(samples.max()), 4),
+    }
+
+
+def run(baskets_list, min_support, args):
+    from mlxtend.frequent_patterns import association_rules
+
+    stages = {}
+    if not args.skip_dense:
+        from mlxtend.preprocessing import TransactionEncoder
+
+        def dense_encode():
+            te = TransactionEncoder()
+            return te.fit(baskets_list).transform(baskets_list)
+
+        timed(stages, "encode_dense", dense_encode)
+
+    baskets = timed(stages, "encode", encode_baskets, baskets_list)
+    miner = choose_miner(baskets, min_support) if args.miner == "auto" else args.miner
+    freq_items = timed(stages, "mine", mine_frequent_itemsets, baskets, min_support, miner, args.max_len)
+    rules = timed(stages, "association_rules", association_rules, freq_items, metric="confidence", min_threshold=args.min_threshold)
+    index = timed(stages, "rec_index", build_rec_index, rules)
+    scorer = timed(stages, "basket_scorer", build_basket_scorer, rules)
+
+    rng = np.random.default_rng(args.seed + 1)
+    products = [baskets.items[i] for i in rng.integers(0, len(baskets.items), args.queries)] if baskets.items else []
+    carts = [baskets_list[i] for i in rng.integers(0, len(baskets_list), args.queries)]
+    return {
+        "min_support": min_support,
+        "miner": miner,
+        "baskets": len(baskets),
+        "products": len(baskets.items),
+        "density": round(baskets.density, 6),
+        "freq_itemsets": len(freq_items),
+        "rules": len(rules),
+        "stages": stages,
+        "recommend": latency(index.lookup, products),
+        "recommend_basket": latency(scorer.recommend, carts),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time encoding, mining, rule generation and recommend() latency.")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--baskets", type=int, default=100_000)
+    parser.add_argument("--basket-size", type=float, default=3.0, help="mean products per basket")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of product popularity")
+    parser.add_argument("--min-support", type=float, nargs="+", default=[0.01, 0.005, 0.002])
+    parser.add_argument("--min-threshold", type=float, default=0.01)
+    parser.add_argument("--miner", default="auto")
+    parser.add_argument("--max-len", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=2_000, help="recommend() calls per latency sample")
+    parser.add_argument("--skip-dense", action="store_true", help="skip the legacy TransactionEncoder step")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    baskets_list = generate_baskets(args.products, args.baskets, args.basket_size, args.skew, seed=args.seed)
+    tracemalloc.start()
+    results = [run(baskets_list, s, args) for s in args.min_support]
+    tracemalloc.stop()
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k != "out"},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
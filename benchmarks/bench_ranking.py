@@ -0,0 +1,63 @@
+import argparse
+import random
+import time
+
+from benchmarks.synthetic import generate_baskets
+from loader import encode_baskets
+from model_store import build_model
+from ranking import Ranking
+
+
+def hit_rate(model, holdout, k, seed):
+    # Leave-one-out on held-out baskets: recommend from one item, count a
+    # hit when another item of the same basket is in the top k.
+    rng = random.Random(seed)
+    hits = total = 0
+    for basket in holdout:
+        if len(basket) < 2:
+            continue
+        query = rng.choice(basket)
+        recs = {name for name, _ in model.rec_index.lookup(query, k)}
+        hits += bool(recs & (set(basket) - {query}))
+        total += 1
+    return hits / total if total else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rule count, index size and hit rate per ranking setup.")
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--baskets", type=int, default=50_000)
+    parser.add_argument("--min-support", type=float, default=0.002)
+    parser.add_argument("--min-threshold", type=float, default=0.01)
+    parser.add_argument("--max-len", type=int, default=4)
+    parser.add_argument("--top-k", type=int, default=5, help="rules per antecedent for the pruned setups")
+    parser.add_argument("--k", type=int, default=4, help="recommendations per query")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = generate_baskets(args.products, args.baskets, seed=args.seed)
+    split = int(len(data) * 0.8)
+    train = encode_baskets(data[:split])
+    setups = [
+        Ranking(),
+        Ranking(prune=True),
+        Ranking(top_k=args.top_k),
+        Ranking(top_k=args.top_k, prune=True),
+        Ranking("lift", top_k=args.top_k, prune=True),
+        Ranking("conviction", top_k=args.top_k, prune=True),
+        Ranking("blend", top_k=args.top_k, prune=True),
+    ]
+    print(f"{'rank_by':>11} {'top_k':>6} {'prune':>6} {'rules':>8} {'index MB':>9} {'build':>7} {f'hit@{args.k}':>7}")
+    for ranking in setups:
+        start = time.perf_counter()
+        model = build_model(train, args.min_support, args.min_threshold, "auto", args.max_len, ranking=ranking)
+        elapsed = time.perf_counter() - start
+        mb = model.rec_index.nbytes / 1e6
+        print(
+            f"{ranking.rank_by:>11} {str(ranking.top_k or '-'):>6} {str(ranking.prune):>6} {model.stats['rules']:>8} "
+            f"{mb:>9.3f} {elapsed:>6.2f}s {hit_rate(model, data[split:], args.k, args.seed):>7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
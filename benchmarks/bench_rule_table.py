@@ -0,0 +1,117 @@
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from benchmarks.synthetic import product_names
+from model_store import Model
+from recommender import BasketScorer, build_basket_scorer
+from rule_table import RuleTable
+
+# association_rules() metric columns (mlxtend 0.23+).
+METRICS = [
+    "antecedent support", "consequent support", "support", "confidence", "lift", "representativity",
+    "leverage", "conviction", "zhangs_metric", "jaccard", "certainty", "kulczynski",
+]
+
+
+def synthetic_rules(n_rules, n_products, seed=0):
+    # A frame shaped like association_rules() output: 1-3 item antecedents,
+    # 1-2 item consequents, random metrics.
+    rng = np.random.default_rng(seed)
+    names = product_names(n_products)
+    ant_sizes = rng.integers(1, 4, size=n_rules)
+    cons_sizes = rng.integers(1, 3, size=n_rules)
+    picks = rng.integers(0, n_products, size=(n_rules, 5)).tolist()
+    ants = [frozenset(names[j] for j in row[:k]) for row, k in zip(picks, ant_sizes.tolist())]
+    cons = [frozenset(names[j] for j in row[3:3 + k]) - a or frozenset([names[row[3]]]) for row, k, a in
+            zip(picks, cons_sizes.tolist(), ants)]
+    frame = pd.DataFrame({"antecedents": ants, "consequents": cons})
+    for col in METRICS:
+        frame[col] = rng.random(n_rules)
+    return frame
+
+
+def same_cart_rankings(table, frame, n_carts, seed=0):
+    # Cart recommendations from the stored table (the path Model serves
+    # from) must equal the ones scored straight off the float64 DataFrame.
+    served = Model(None, None, {}, rule_table=table).basket_scorer
+    reference = build_basket_scorer(frame, names=table.names)
+    rng = np.random.default_rng(seed)
+    sizes = rng.integers(1, 6, size=n_carts)
+    offsets = np.r_[0, np.cumsum(sizes)]
+    items = np.concatenate([rng.choice(len(table.names), size=s, replace=False) for s in sizes.tolist()])
+    carts = sparse.csr_matrix(
+        (np.ones(len(items), dtype=np.float32), items, offsets), shape=(n_carts, len(table.names)),
+    )
+    for agg in BasketScorer.AGGREGATES:
+        got = served.recommend_many(carts, 10, agg)
+        want = reference.recommend_many(carts, 10, agg)
+        if not all(np.array_equal(a, b) for a, b in zip(got, want)):
+            return False
+    return True
+
+
+def _worker_sum(path):
+    # Opens the table the way batch workers open the model artifact.
+    start = time.perf_counter()
+    table = RuleTable.load(path)
+    total = float(np.asarray(table.column("confidence"), dtype=np.float64).sum())
+    return time.perf_counter() - start, total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory and speed of RuleTable vs. the association_rules DataFrame.")
+    parser.add_argument("--rules", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--carts", type=int, default=2_000, help="random carts for the ranking check")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    frame = synthetic_rules(args.rules, args.products, args.seed)
+    frame_bytes = int(frame.memory_usage(index=True, deep=True).sum())
+
+    start = time.perf_counter()
+    table = RuleTable.from_rules(frame)
+    t_convert = time.perf_counter() - start
+
+    start = time.perf_counter()
+    longest = max(len(a) + len(c) for a, c in zip(frame["antecedents"], frame["consequents"]))
+    t_iter_frame = time.perf_counter() - start
+    start = time.perf_counter()
+    sizes = np.diff(table.ant_offsets) + np.diff(table.cons_offsets)
+    assert int(sizes.max()) == longest
+    t_iter_table = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as path:
+        table.save(path)
+        disk = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        start = time.perf_counter()
+        loaded = RuleTable.load(path)
+        t_load = time.perf_counter() - start
+        assert len(loaded) == len(table)
+        if not same_cart_rankings(loaded, frame, args.carts, args.seed):
+            raise SystemExit("cart rankings from the RuleTable differ from the DataFrame's")
+        with ProcessPoolExecutor(args.workers) as pool:
+            opened = list(pool.map(_worker_sum, [path] * args.workers))
+
+    mb = 1024 * 1024
+    print(f"{args.rules:,} rules over {args.products:,} products")
+    print(f"  DataFrame (deep):  {frame_bytes / mb:>9.1f} MB  {frame_bytes / args.rules:>6.0f} B/rule")
+    print(f"  RuleTable:         {table.nbytes / mb:>9.1f} MB  {table.nbytes / args.rules:>6.0f} B/rule"
+          f"  ({frame_bytes / table.nbytes:.1f}x smaller)")
+    print(f"  on disk:           {disk / mb:>9.1f} MB")
+    print(f"  convert {t_convert:.2f}s, mmap load {t_load * 1e3:.1f}ms, "
+          f"{args.workers} workers open + scan a column {max(t for t, _ in opened) * 1e3:.1f}ms each")
+    print(f"  cart rankings over {args.carts:,} carts x {len(BasketScorer.AGGREGATES)} aggregates: identical")
+    print(f"  itemset sizes over all rules: DataFrame {t_iter_frame * 1e3:.0f}ms, RuleTable {t_iter_table * 1e3:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
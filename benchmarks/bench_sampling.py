@@ -0,0 +1,56 @@
+import argparse
+import time
+
+import numpy as np
+from mlxtend.frequent_patterns import association_rules
+
+from benchmarks.synthetic import generate_baskets
+from loader import encode_baskets
+from mining import mine_frequent_itemsets
+from sampling import SampledMiner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sampled preview mining vs. a full run: time, recall, bound coverage.")
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--baskets", type=int, default=300_000)
+    parser.add_argument("--sample", type=int, nargs="+", default=[10_000, 30_000, 100_000])
+    parser.add_argument("--min-support", type=float, default=0.001)
+    parser.add_argument("--min-threshold", type=float, default=0.05)
+    parser.add_argument("--max-len", type=int, default=3)
+    parser.add_argument("--delta", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    baskets = encode_baskets(generate_baskets(args.products, args.baskets, seed=args.seed))
+    start = time.perf_counter()
+    freq = mine_frequent_itemsets(baskets, args.min_support, max_len=args.max_len)
+    full = association_rules(freq, metric="confidence", min_threshold=args.min_threshold)
+    t_full = time.perf_counter() - start
+    truth = {(a, c): (s, conf) for a, c, s, conf in zip(full["antecedents"], full["consequents"], full["support"], full["confidence"])}
+    print(f"full run: {len(freq)} itemsets, {len(full)} rules in {t_full:.2f}s")
+    print(f"{'sample':>8} {'mode':>7} {'seconds':>8} {'speedup':>8} {'rules':>7} {'recall':>7} {'precision':>10} "
+          f"{'sup in bounds':>14} {'conf in bounds':>15}")
+
+    for size in args.sample:
+        sampler = SampledMiner.from_baskets(baskets, size, seed=args.seed, delta=args.delta)
+        for verify in (False, True):
+            _, rules, report = sampler.mine(args.min_support, args.min_threshold, max_len=args.max_len, verify=verify)
+            keys = list(zip(rules["antecedents"], rules["consequents"]))
+            hits = [k in truth for k in keys]
+            recall = sum(hits) / len(truth) if truth else 1.0
+            precision = sum(hits) / len(keys) if keys else 1.0
+            sup_in = conf_in = []
+            if any(hits):
+                true = np.array([truth[k] for k, h in zip(keys, hits) if h])
+                h = np.array(hits)
+                sup_in = (rules["support_low"][h] <= true[:, 0] + 1e-12) & (true[:, 0] <= rules["support_high"][h] + 1e-12)
+                conf_in = (rules["confidence_low"][h] <= true[:, 1] + 1e-12) & (true[:, 1] <= rules["confidence_high"][h] + 1e-12)
+            print(f"{size:>8} {'verify' if verify else 'sample':>7} {report['seconds']:>7.2f}s "
+                  f"{t_full / report['seconds']:>7.1f}x {len(rules):>7} {recall:>7.3f} {precision:>10.3f} "
+                  f"{np.mean(sup_in) if len(sup_in) else 1.0:>14.3f} {np.mean(conf_in) if len(conf_in) else 1.0:>15.3f}"
+                  + (f"  border hits: {report['border_frequent']}" if verify else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import metrics
+
+
+def load_app(store, scratch):
+    # Imports app.py against scratch state: the real catalog and baskets
+    # are only read, the model artifact goes under `scratch`, and nothing
+    # is journaled to data/state.db. Waits for the model and its top-k table.
+    config.MODEL_DIR = os.path.join(scratch, "model")
+    config.STATE_PATH = None
+    config.SESSION_STORE = store
+    config.METRICS_PORT = None
+    metrics.enable()  # the top-k hit counters are metrics counters
+    import app
+
+    app.models.ready.wait()
+    if app.topk is not None:
+        app.topk.refresh(app.models.model)
+    return app
+
+
+def session(shop, user, products, actions, seed):
+    # One simulated shopper (already signed up): a random mix of recommend,
+    # like and add-to-cart clicks. Returns the products it liked and carted.
+    rng = random.Random(seed)
+    liked, cart = set(), set()
+    for _ in range(actions):
+        p = rng.choice(products)
+        action = rng.random()
+        if action < 0.5:
+            shop.recommend(p, user)
+        elif action < 0.75:
+            shop.like_product(p, user)
+            liked.add(p)
+        else:
+            shop.cart_product(p, user)
+            cart.add(p)
+    return user, liked, cart
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent shopper sessions against the app handlers.")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--actions", type=int, default=50, help="clicks per user")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--store", default="memory", help="'memory' or 'sqlite:///path'")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        shop = load_app(args.store, scratch)
+        products = shop.catalog.names
+        users = [f"user{i}" for i in range(args.users)]
+        before = {p: (shop.catalog.get(p).liked_count, shop.catalog.get(p).cart_count) for p in products}
+
+        # Sign-ups hash a password each, so they are timed on their own.
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(shop.signup, users, ["pw"] * args.users))
+        t_signup = time.perf_counter() - start
+
+        metrics.reset()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            results = list(pool.map(
+                session, [shop] * args.users, users, [products] * args.users,
+                [args.actions] * args.users, range(args.seed, args.seed + args.users),
+            ))
+        elapsed = time.perf_counter() - start
+
+        # Every session must see exactly its own clicks, and the shared
+        # counters must add up to the sum of all sessions.
+        expected_likes = dict.fromkeys(products, 0)
+        expected_carts = dict.fromkeys(products, 0)
+        for user, liked, cart in results:
+            if set(shop.sessions.get_list(user, "liked")) != liked or set(shop.sessions.get_list(user, "cart")) != cart:
+                raise SystemExit(f"session state leaked between users ({user})")
+            for p in liked:
+                expected_likes[p] += 1
+            for p in cart:
+                expected_carts[p] += 1
+        for p in products:
+            p_now = shop.catalog.get(p)
+            if (p_now.liked_count - before[p][0], p_now.cart_count - before[p][1]) != (expected_likes[p], expected_carts[p]):
+                raise SystemExit(f"lost counter updates for {p}")
+
+    clicks = args.users * args.actions
+    counters = metrics.snapshot()["counters"]
+    hits, misses = counters.get("topk_hits", 0), counters.get("topk_misses", 0)
+    print(f"{args.users} sign-ups on {args.threads} threads: {t_signup:.2f}s")
+    print(f"{args.users} users x {args.actions} clicks on {args.threads} threads ({args.store}): "
+          f"{elapsed:.2f}s, {clicks / elapsed:,.0f} clicks/sec, state consistent")
+    print(f"top-k table: hits={hits}, misses={misses}, hit_rate={hits / (hits + misses) if hits + misses else 0:.3g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import argparse
+import time
+
+from benchmarks.synthetic import generate_baskets, product_names
+from loader import encode_baskets
+from model_store import build_model
+from sharding import Sharding
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mining time, rules and lookup cost: flat vs. category-sharded.")
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--baskets", type=int, default=200_000)
+    parser.add_argument("--categories", type=int, default=40, help="contiguous blocks of product ids")
+    parser.add_argument("--min-support", type=float, default=0.0005)
+    parser.add_argument("--min-threshold", type=float, default=0.01)
+    parser.add_argument("--max-len", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    names = product_names(args.products)
+    block = -(-args.products // args.categories)
+    categories = {p: f"Category {i // block:03d}" for i, p in enumerate(names)}
+    baskets = encode_baskets(generate_baskets(args.products, args.baskets, seed=args.seed))
+    print(f"{len(baskets)} baskets, {len(baskets.items)} products, {args.categories} categories")
+    print(f"{'mode':>13} {'mine':>8} {'shards':>7} {'rules':>7} {'lookup p50':>11}")
+
+    for mode in (None, "category", "hierarchical"):
+        sharding = Sharding(mode, categories) if mode else None
+        start = time.perf_counter()
+        model = build_model(
+            baskets, args.min_support, args.min_threshold, "auto", args.max_len, workers=args.workers, sharding=sharding,
+        )
+        elapsed = time.perf_counter() - start
+        latencies = []
+        for p in names[:1000]:
+            t = time.perf_counter()
+            model.rec_index.lookup(p, 4)
+            latencies.append(time.perf_counter() - t)
+        latencies.sort()
+        shards = model.stats.get("shards_mined", "-")
+        print(f"{mode or 'flat':>13} {elapsed:>7.2f}s {shards:>7} {model.stats['rules']:>7} "
+              f"{latencies[len(latencies) // 2] * 1e6:>9.1f}us")
+
+
+if __name__ == "__main__":
+    main()
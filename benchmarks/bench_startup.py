@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter: optionally points config at another
+# transactions file / an empty model dir, imports the app and reports when
+# the import returned and when recommendations became available.
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import config
+config.STATE_PATH = None
+if {transactions!r}:
+    config.TRANSACTIONS_PATH = {transactions!r}
+if {model_dir!r}:
+    config.MODEL_DIR = {model_dir!r}
+import app
+t1 = time.perf_counter()
+ready = getattr(getattr(app, "models", None), "ready", None)
+if ready is not None:
+    ready.wait()
+t2 = time.perf_counter()
+heavy = [m for m in ("gradio", "pandas", "scipy", "mlxtend") if m in sys.modules]
+print(json.dumps({{"import_s": t1 - t0, "ready_s": t2 - t0, "loaded": heavy}}))
+"""
+
+
+def importtime(module, cwd):
+    # Self time per top-level package from `python -X importtime`.
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import config; config.STATE_PATH = None; import {module}"],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    per_package = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        per_package[package] = per_package.get(package, 0) + int(self_us)
+    return per_package
+
+
+def probe(cwd, transactions=None, model_dir=None):
+    code = PROBE.format(transactions=transactions, model_dir=model_dir)
+    proc = subprocess.run([sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import-time breakdown and cold/warm time-to-ready of the app.")
+    parser.add_argument("--root", default=ROOT, help="checkout to measure (compare two trees with this)")
+    parser.add_argument("--transactions", default=None, help="transactions file for the cold start")
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args(argv)
+
+    per_package = importtime("app", args.root)
+    total = sum(per_package.values())
+    print(f"import app: {total / 1e6:.2f}s of module execution (-X importtime self times)")
+    for package, us in sorted(per_package.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {package:<24} {us / 1e6:>7.3f}s")
+
+    # A scratch model dir: the cold run mines and writes the artifact, the
+    # warm run loads it. The app's own data/model/ is left alone.
+    with tempfile.TemporaryDirectory() as scratch:
+        model_dir = os.path.join(scratch, "model")
+        cold = probe(args.root, args.transactions, model_dir)
+        warm = probe(args.root, args.transactions, model_dir)
+    for label, r in (("cold (no artifact)", cold), ("warm (cached artifact)", warm)):
+        print(f"{label:<24} import returns {r['import_s']:.2f}s, recommendations ready {r['ready_s']:.2f}s, "
+              f"loaded: {', '.join(r['loaded'])}")
+
+
+if __name__ == "__main__":
+    main()
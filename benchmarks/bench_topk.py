@@ -0,0 +1,100 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.synthetic import generate_baskets, product_names
+from catalog import Catalog, Product, badge_text
+from loader import encode_baskets
+from model_store import build_model
+from topk_table import TopKTable
+
+
+def synthetic_catalog(names, seed=0):
+    rng = random.Random(seed)
+    return Catalog(
+        Product(i, name, "", f"https://example.com/{i}.jpg", rng.randint(99, 9999), "",
+                rng.randint(0, 2000), rng.randint(0, 1600))
+        for i, name in enumerate(names)
+    )
+
+
+def index_cards(index, catalog, product):
+    # What recommend() did per click before the table.
+    recs = [(n, s) for n, s in index.lookup(product, k=4) if n in catalog]
+    return [catalog.gallery_item(n, catalog.badge(n)) for n, _ in recs], [n for n, _ in recs]
+
+
+def table_cards(table, catalog, product):
+    names, _, flags = table.row(product)
+    return [catalog.gallery_item(n, badge_text(f)) for n, f in zip(names, flags)], names
+
+
+def _worker_open(path, names, queries):
+    # A worker process mapping the shared file and serving lookups.
+    start = time.perf_counter()
+    table = TopKTable.load(path, None, names)
+    opened = time.perf_counter() - start
+    start = time.perf_counter()
+    for p in queries:
+        table.row(p)
+    return opened, (time.perf_counter() - start) / len(queries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precomputed top-k table vs. per-click index lookups.")
+    parser.add_argument("--products", type=int, default=5_000)
+    parser.add_argument("--baskets", type=int, default=200_000)
+    parser.add_argument("--min-support", type=float, default=0.0005)
+    parser.add_argument("--queries", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    names = product_names(args.products)
+    catalog = synthetic_catalog(names, args.seed)
+    model = build_model(
+        encode_baskets(generate_baskets(args.products, args.baskets, seed=args.seed)), args.min_support, 0.05,
+        max_len=3, key="bench",
+    )
+    index = model.rec_index
+    rng = random.Random(args.seed)
+    queries = [rng.choice(names) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    table = TopKTable.build(index, catalog, 4, model.key)
+    t_build = time.perf_counter() - start
+    assert all(table_cards(table, catalog, p) == index_cards(index, catalog, p) for p in names)
+
+    # Clicks over the whole catalog, and over products that have
+    # recommendations (where the per-click work actually happens).
+    filled = [p for p in names if table.row(p)[0]]
+    timings = {}
+    for label, pool in (("all products", names), ("with recommendations", filled)):
+        picks = [rng.choice(pool) for _ in range(args.queries)] if pool else []
+        for fn, source in ((index_cards, index), (table_cards, table)):
+            start = time.perf_counter()
+            for p in picks:
+                fn(source, catalog, p)
+            timings[label, fn] = (time.perf_counter() - start) / max(len(picks), 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = table.save(os.path.join(tmp, "topk.npy"))
+        with ProcessPoolExecutor(args.workers) as pool:
+            opened = list(pool.map(_worker_open, [path] * args.workers, [names] * args.workers,
+                                   [queries[:10_000]] * args.workers))
+
+    print(f"{args.products:,} products, {model.stats['rules']:,} rules")
+    print(f"  table: {table.nbytes / 1024:.1f} KB ({table.rows.dtype.itemsize} B/product), built in {t_build:.2f}s")
+    for label, pool in (("all products", names), ("with recommendations", filled)):
+        t_index, t_table = timings[label, index_cards], timings[label, table_cards]
+        print(f"  cards per click, {label} ({len(pool):,}): index lookup + badges {t_index * 1e6:.1f}us, "
+              f"table row {t_table * 1e6:.1f}us ({t_index / t_table:.1f}x)")
+    print(f"  {args.workers} workers: open {max(o for o, _ in opened) * 1e3:.2f}ms, "
+          f"row read {max(r for _, r in opened) * 1e6:.2f}us")
+
+
+if __name__ == "__main__":
+    main()
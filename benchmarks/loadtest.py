@@ -0,0 +1,306 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.synthetic import generate_baskets, product_names, write_transactions
+
+# Headless load test: virtual shoppers sign up, then click through a
+# weighted mix of actions with exponential think times. Stages run at
+# increasing concurrency, and each reports throughput, latency
+# percentiles and errors.
+#
+# --target handlers (default) calls app.py's handler functions in-process
+#     the way Gradio's queue does: async handlers on the event loop, sync
+#     ones on worker threads, and at most CONCURRENCY_LIMIT concurrent
+#     calls per event.
+# --target http drives a running server (--url) or one launched here
+#     through the Gradio HTTP API with gradio_client, one client session
+#     per shopper. The select / like / add-to-cart clicks depend on
+#     gallery event data and server-side state that the public API can't
+#     send, so they are dropped from the mix.
+#
+# By default everything runs against a synthetic catalog and basket file
+# in a scratch directory, never the real data/ or its state.db.
+DEFAULT_MIX = "recommend=40,select=20,like=10,cart=10,liked=5,cart_view=5,recent=3,cart_recs=5,home=2"
+HTTP_ENDPOINTS = {
+    "recommend": "/recommend", "liked": "/liked_dashboard", "cart_view": "/cart_dashboard",
+    "recent": "/recent_dashboard", "cart_recs": "/recommend_for_cart", "home": "/home_dashboard",
+}
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"recommend", "select", "like", "cart", "liked", "cart_view", "recent", "cart_recs", "home"}
+    if unknown:
+        raise SystemExit(f"unknown actions in --mix: {sorted(unknown)}")
+    return mix
+
+
+def write_catalog(path, names, seed=0):
+    # products.csv in the app's column layout, ten categories.
+    import csv
+
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["product_id", "product_name", "category", "image_url", "price", "description", "liked_count"])
+        for i, name in enumerate(names):
+            w.writerow([
+                i + 1, name, f"Category {i % 10}", f"https://example.com/products/{i}.jpg",
+                rng.randint(99, 99_999), f"Synthetic product {i}", int(rng.paretovariate(1.2) * 10),
+            ])
+
+
+def prepare(args, scratch):
+    # Points config at a synthetic catalog and a scratch model dir before
+    # app.py is imported, then waits for the model.
+    import config
+
+    if not args.real_data:
+        names = product_names(args.products)
+        config.PRODUCTS_PATH = os.path.join(scratch, "products.csv")
+        config.TRANSACTIONS_PATH = os.path.join(scratch, "transactions.csv")
+        write_catalog(config.PRODUCTS_PATH, names, args.seed)
+        write_transactions(config.TRANSACTIONS_PATH, generate_baskets(args.products, args.baskets, seed=args.seed))
+        config.MODEL_DIR = os.path.join(scratch, "model")
+    config.STATE_PATH = None
+    config.SESSION_STORE = args.store
+    config.METRICS_PORT = None
+    import app
+
+    app.models.ready.wait()
+    return app
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}  # action -> seconds
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, action, seconds, error=None):
+        with self._lock:
+            self.latencies.setdefault(action, []).append(seconds)
+            if error is not None:
+                self.errors[f"{action}: {type(error).__name__}"] += 1
+
+    def summary(self, elapsed):
+        everything = sorted(x for values in self.latencies.values() for x in values)
+        n = len(everything)
+        errors = sum(self.errors.values())
+        return {
+            "requests": n, "throughput": n / elapsed if elapsed else 0.0,
+            "p50_ms": _percentile(everything, 0.50) * 1e3, "p95_ms": _percentile(everything, 0.95) * 1e3,
+            "p99_ms": _percentile(everything, 0.99) * 1e3, "max_ms": (everything[-1] if n else 0.0) * 1e3,
+            "errors": errors, "error_rate": errors / n if n else 0.0, "error_kinds": dict(self.errors),
+            "actions": {
+                a: {"count": len(v), "p50_ms": _percentile(sorted(v), 0.5) * 1e3, "p99_ms": _percentile(sorted(v), 0.99) * 1e3}
+                for a, v in sorted(self.latencies.items())
+            },
+        }
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def handler_shopper(shop, user, products, mix, think, deadline, rec, seed, limits):
+    import gradio as gr
+
+    rng = random.Random(seed)
+    actions, weights = list(mix), list(mix.values())
+    shown, selected = [], None
+
+    async def call(action, fn, *args):
+        # Gradio: at most CONCURRENCY_LIMIT running calls per event, sync
+        # handlers on a worker thread.
+        start = time.perf_counter()
+        try:
+            async with limits[action]:
+                if asyncio.iscoroutinefunction(fn):
+                    out = await fn(*args)
+                else:
+                    out = await asyncio.to_thread(fn, *args)
+        except Exception as e:
+            rec.add(action, time.perf_counter() - start, e)
+            return None
+        rec.add(action, time.perf_counter() - start)
+        return out
+
+    await call("signup", shop.signup, user, "pw")
+    while time.perf_counter() < deadline:
+        if think:
+            await asyncio.sleep(rng.expovariate(1.0 / think))
+        action = rng.choices(actions, weights)[0]
+        if action == "select" and not shown:
+            action = "recommend"
+        if action == "recommend":
+            out = await call(action, shop.recommend, rng.choice(products), user)
+            shown = list(out[2]) if out else []
+        elif action == "select":
+            i = rng.randrange(len(shown))
+            out = await call(action, shop.on_select, gr.SelectData(None, {"index": i, "value": None}), shown)
+            selected = out[0] if out else None
+        elif action in ("like", "cart"):
+            fn = shop.like_from_detail if action == "like" else shop.cart_from_detail
+            await call(action, fn, selected or rng.choice(products), user)
+        elif action in ("liked", "cart_view", "recent"):
+            fn = {"liked": shop.liked_dashboard, "cart_view": shop.cart_dashboard, "recent": shop.recent_dashboard}[action]
+            out = await call(action, fn, user)
+            shown = list(out[2]) if out else []
+        elif action == "cart_recs":
+            out = await call(action, shop.recommend_for_cart, user)
+            shown = list(out[2]) if out and len(out) > 2 else []
+        else:
+            await call(action, shop.home_dashboard)
+
+
+def run_handlers_stage(shop, concurrency, args, mix, stage):
+    import config
+
+    products = shop.catalog.names
+    rec = Recorder()
+
+    async def main():
+        limits = {a: asyncio.Semaphore(config.CONCURRENCY_LIMIT) for a in list(mix) + ["signup"]}
+        deadline = time.perf_counter() + args.duration
+        await asyncio.gather(*(
+            handler_shopper(shop, f"lt{stage}-{i}", products, mix, args.think, deadline, rec, args.seed * 100_003 + i, limits)
+            for i in range(concurrency)
+        ))
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    return rec.summary(time.perf_counter() - start)
+
+
+def run_http_stage(url, concurrency, args, mix, stage, products):
+    from gradio_client import Client
+
+    mix = {a: w for a, w in mix.items() if a in HTTP_ENDPOINTS}
+    actions, weights = list(mix), list(mix.values())
+    rec = Recorder()
+    # Client sessions are opened before the clock starts.
+    with ThreadPoolExecutor(concurrency) as pool:
+        clients = list(pool.map(lambda _: Client(url, verbose=False, download_files=False), range(concurrency)))
+
+    def shopper(i):
+        rng = random.Random(args.seed * 100_003 + i)
+        client = clients[i]
+
+        def call(action, endpoint, *params):
+            start = time.perf_counter()
+            try:
+                client.predict(*params, api_name=endpoint)
+            except Exception as e:
+                rec.add(action, time.perf_counter() - start, e)
+                return
+            rec.add(action, time.perf_counter() - start)
+
+        call("signup", "/signup", f"lt{stage}-{i}", "pw")
+        while time.perf_counter() < deadline:
+            if args.think:
+                time.sleep(rng.expovariate(1.0 / args.think))
+            action = rng.choices(actions, weights)[0]
+            params = (rng.choice(products),) if action == "recommend" else ()
+            call(action, HTTP_ENDPOINTS[action], *params)
+
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(shopper, range(concurrency)))
+    for client in clients:
+        client.close()
+    return rec.summary(time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the app's handlers at increasing concurrency.")
+    parser.add_argument("--target", choices=["handlers", "http"], default="handlers")
+    parser.add_argument("--url", help="running app for --target http (default: launch one here)")
+    parser.add_argument("--port", type=int, default=7870, help="port for the server launched by --target http")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64], help="shoppers per stage")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per stage")
+    parser.add_argument("--think", type=float, default=0.1, help="mean think time between clicks (seconds)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="action=weight,... from " + DEFAULT_MIX)
+    parser.add_argument("--products", type=int, default=500, help="synthetic catalog size")
+    parser.add_argument("--baskets", type=int, default=50_000, help="synthetic transactions")
+    parser.add_argument("--real-data", action="store_true", help="use data/ (state.db stays untouched)")
+    parser.add_argument("--store", default="memory", help="SESSION_STORE for the run")
+    parser.add_argument("--per-action", action="store_true", help="latency per action for every stage")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--max-p99-ms", type=float, help="exit non-zero if any stage's p99 is above this")
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="exit non-zero above this error rate")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        url = args.url
+        shop = None
+        if not (args.target == "http" and url):
+            start = time.perf_counter()
+            shop = prepare(args, scratch)
+            print(f"app ready in {time.perf_counter() - start:.1f}s: {len(shop.catalog.names)} products, "
+                  f"{shop.models.model.stats.get('rules')} rules, store={args.store}")
+        if args.target == "http" and not url:
+            import config
+
+            shop.app.queue(default_concurrency_limit=config.CONCURRENCY_LIMIT)
+            shop.app.launch(prevent_thread_lock=True, server_name="127.0.0.1", server_port=args.port,
+                            quiet=True, share=False)
+            url = f"http://127.0.0.1:{args.port}/"
+        if args.target == "http":
+            dropped = sorted(set(mix) - set(HTTP_ENDPOINTS))
+            if dropped:
+                print(f"http target: not available over the API, dropped from the mix: {', '.join(dropped)}")
+        products = shop.catalog.names if shop else product_names(args.products)
+
+        print(f"{'users':>6} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'max ms':>8} {'errors':>7}")
+        results = []
+        for stage, concurrency in enumerate(args.concurrency):
+            if args.target == "http":
+                r = run_http_stage(url, concurrency, args, mix, stage, products)
+            else:
+                r = run_handlers_stage(shop, concurrency, args, mix, stage)
+            r["concurrency"] = concurrency
+            results.append(r)
+            print(f"{concurrency:>6} {r['requests']:>9} {r['throughput']:>8.1f} {r['p50_ms']:>8.1f} "
+                  f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f} {r['errors']:>7}")
+            if args.per_action:
+                for action, a in r["actions"].items():
+                    print(f"{'':>6}   {action:<10} {a['count']:>7} p50 {a['p50_ms']:>7.1f} ms  p99 {a['p99_ms']:>7.1f} ms")
+            for kind, n in r["error_kinds"].items():
+                print(f"{'':>6}   error {kind} x{n}")
+        if shop is not None and args.target == "http" and not args.url:
+            shop.app.close()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"target": args.target, "mix": mix, "think": args.think, "stages": results}, f, indent=2)
+
+    failed = [
+        r["concurrency"] for r in results
+        if r["error_rate"] > args.max_error_rate or (args.max_p99_ms is not None and r["p99_ms"] > args.max_p99_ms)
+    ]
+    if failed:
+        print(f"FAILED gates at concurrency {failed}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def product_names(n_products):
+    return [f"Product {i:05d}" for i in range(n_products)]
+
+
+def generate_baskets(n_products=500, n_baskets=100_000, mean_size=3.0, skew=1.1, companion_rate=0.3, seed=0):
+    # Baskets of Zipf-popular products. Each drawn product pulls in its
+    # "companion" (the next product id) with probability companion_rate,
+    # so the data carries real associations for the miners to find.
+    rng = np.random.default_rng(seed)
+    names = product_names(n_products)
+    weights = 1.0 / np.arange(1, n_products + 1) ** skew
+    weights /= weights.sum()
+
+    sizes = 1 + rng.poisson(max(mean_size - 1.0, 0.0), size=n_baskets)
+    draws = rng.choice(n_products, size=int(sizes.sum()), p=weights)
+    companions = np.where(rng.random(len(draws)) < companion_rate, (draws + 1) % n_products, -1)
+    bounds = np.cumsum(sizes)[:-1]
+
+    baskets = []
+    for picked, extra in zip(np.split(draws, bounds), np.split(companions, bounds)):
+        ids = dict.fromkeys(picked.tolist())
+        ids.update(dict.fromkeys(e for e in extra.tolist() if e >= 0))
+        baskets.append([names[i] for i in ids])
+    return baskets
+
+
+def write_transactions(path, baskets):
+    # Same comma-per-basket format as data/transactions.csv.
+    with open(path, "w", encoding="utf-8") as f:
+        for basket in baskets:
+            f.write(",".join(basket) + "\n")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a synthetic transactions.csv.")
+    parser.add_argument("out")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--baskets", type=int, default=100_000)
+    parser.add_argument("--basket-size", type=float, default=3.0)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_transactions(args.out, generate_baskets(args.products, args.baskets, args.basket_size, args.skew, seed=args.seed))
+
+
+if __name__ == "__main__":
+    main()
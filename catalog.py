@@ -0,0 +1,138 @@
+import csv
+import functools
+import threading
+
+
+# Popularity badge thresholds shown on recommendation cards.
+HOT_LIKES = 1000
+POPULAR_CARTS = 800
+
+# Badge bits, as stored in the precomputed top-k table (topk_table.py).
+HOT = 1
+POPULAR = 2
+
+
+class Product:
+    __slots__ = ("product_id", "product_name", "category", "image_url", "price", "description", "liked_count", "cart_count")
+
+    def __init__(self, product_id, product_name, category, image_url, price, description, liked_count, cart_count):
+        self.product_id = product_id
+        self.product_name = product_name
+        self.category = category
+        self.image_url = image_url
+        self.price = price
+        self.description = description
+        self.liked_count = liked_count
+        self.cart_count = cart_count
+
+
+class Catalog:
+    # Product records keyed by name (and id) for constant-time reads and
+    # counter bumps. The first row wins when a name appears twice, matching
+    # the old `products_df[products_df["product_name"] == name].iloc[0]`.
+
+    def __init__(self, products):
+        self.products = {}
+        self.by_id = {}
+        for p in products:
+            self.products.setdefault(p.product_name, p)
+            self.by_id.setdefault(p.product_id, p)
+        self.names = list(self.products)
+        self._gallery = {}
+        self._lock = threading.Lock()
+        self.journal = None  # persistence.StateJournal recording counter clicks
+        self.badge_listeners = []  # called with a product name when its badge text changes
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(
+            Product(
+                getattr(r, "product_id", None), r.product_name, getattr(r, "category", ""),
+                r.image_url, float(r.price), getattr(r, "description", ""),
+                int(r.liked_count), int(r.cart_count),
+            )
+            for r in df.itertuples(index=False)
+        )
+
+    @classmethod
+    def from_csv(cls, path):
+        # Plain csv module rather than pandas: the catalog is read at every
+        # start and needs none of pandas' machinery. Unparseable prices
+        # become 999 and missing counters get the usual defaults.
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return cls(
+                Product(
+                    _id(row.get("product_id")), row["product_name"], row.get("category") or "",
+                    row["image_url"], _number(row["price"], 999), row.get("description") or "",
+                    int(_number(row.get("liked_count"), 1200)), int(_number(row.get("cart_count"), 800)),
+                )
+                for row in csv.DictReader(f)
+            )
+
+    def __contains__(self, name):
+        return name in self.products
+
+    def __len__(self):
+        return len(self.products)
+
+    def get(self, name):
+        return self.products.get(name)
+
+    def increment(self, name, counter, delta=1):
+        # Handlers run on several queue threads; the read-modify-write must
+        # not interleave or concurrent likes get lost.
+        p = self.products.get(name)
+        if p is not None:
+            with self._lock:
+                before = self.badge(name)
+                setattr(p, counter, getattr(p, counter) + delta)
+                changed = self.badge(name) != before
+            if self.journal is not None:
+                self.journal.add_counter(name, counter, delta)
+            if changed:
+                for listener in self.badge_listeners:
+                    listener(name)
+        return p
+
+    def badge(self, name):
+        return badge_text(self.badge_flags(name))
+
+    def badge_flags(self, name):
+        p = self.products[name]
+        return (HOT if p.liked_count > HOT_LIKES else 0) | (POPULAR if p.cart_count > POPULAR_CARTS else 0)
+
+    def gallery_item(self, name, badge_text=""):
+        # (image, caption) tuples only depend on name, price and badge, so
+        # they are built once per (product, badge).
+        key = (name, badge_text)
+        item = self._gallery.get(key)
+        if item is None:
+            p = self.products[name]
+            label = f"{p.product_name} | ₹{int(p.price)}"
+            if badge_text:
+                label += f" ({badge_text})"
+            item = self._gallery[key] = (p.image_url, label)
+        return item
+
+
+@functools.lru_cache(maxsize=None)
+def badge_text(flags):
+    badges = []
+    if flags & HOT: badges.append("❤️ Hot")
+    if flags & POPULAR: badges.append("🔥 Popular")
+    return " ".join(badges)
+
+
+def _number(value, default):
+    try:
+        x = float(value)
+    except (TypeError, ValueError):
+        return default
+    return default if x != x else x  # NaN
+
+
+def _id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
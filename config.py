@@ -0,0 +1,54 @@
+import os
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+MODEL_DIR = os.path.join(DATA_DIR, "model")
+PRODUCTS_PATH = os.path.join(DATA_DIR, "products.csv")
+TRANSACTIONS_PATH = os.path.join(DATA_DIR, "transactions.csv")
+
+# Order-line exports (loader.read_order_lines): TRANSACTIONS_PATH holds one
+# (order, product id) row per line instead of one basket per line.
+# .parquet files are always read this way.
+ORDER_LINES = False
+ORDER_COLUMN = "order_id"
+PRODUCT_COLUMN = "product_id"  # matched against product_id in products.csv
+MIN_BASKET_SIZE = 2  # orders with fewer known products are dropped before mining
+INGEST_CHUNK_ROWS = 1_000_000  # rows per pandas / pyarrow read
+
+# Mining parameters
+MIN_SUPPORT = 0.001
+MIN_THRESHOLD = 0.01
+MINER = "auto"  # "apriori", "fpgrowth", "eclat" or "auto"
+MAX_LEN = 4
+MINING_WORKERS = 1  # > 1 mines with the SON partition algorithm across processes
+
+# Rule ranking and pruning (the defaults keep every rule, ranked by confidence)
+RANK_BY = "confidence"  # "confidence", "lift", "leverage", "conviction" or "blend"
+RANK_WEIGHTS = {"confidence": 0.5, "lift": 0.5}  # metric weights for "blend"
+RULES_PER_ANTECEDENT = None  # keep only the top-k rules per antecedent
+PRUNE_REDUNDANT = False  # drop A -> C when a subset of A predicts C at least as well
+SHARDING = None  # None, "category" (per-category shards + cross-category pairs) or "hierarchical"
+
+# Sampled previews (python sampling.py): mine a uniform sample to tune the thresholds
+SAMPLE_SIZE = 100_000  # baskets drawn from transactions.csv
+SAMPLE_DELTA = 0.05  # the support/confidence bounds hold with probability 1 - delta
+SAMPLE_VERIFY = False  # count the sampled itemsets exactly against the full data
+
+# Serving
+SESSION_STORE = "memory"  # "memory" or "sqlite:///path/to/sessions.db"
+CONCURRENCY_LIMIT = 8  # concurrent handler calls per event in the Gradio queue
+STATE_PATH = os.path.join(DATA_DIR, "state.db")  # durable likes/carts/counters (None disables)
+STATE_FLUSH_INTERVAL = 2.0  # seconds between batched writes
+STATE_FLUSH_SIZE = 500  # pending changes that trigger an early write
+RESULT_CACHE_SIZE = 1024  # rendered recommendation results kept (0 disables)
+RESULT_CACHE_TTL = 300.0  # seconds before a cached result is recomputed
+TOPK_TABLE = True  # serve single-product recommendations from the precomputed top-k table (topk_table.py)
+REFRESH_INTERVAL = 30.0  # seconds between checks of transactions.csv for a background re-mine
+INCREMENTAL_REFRESH = False  # fold appended transactions.csv lines in (incremental.py) instead of re-mining
+PERSONALIZATION_WEIGHT = 0.3  # share of the item-item similarity score in recommend(); 0 disables
+PERSONALIZATION_TOP_N = 20  # neighbors kept per product
+PERSONALIZATION_CANDIDATES = 20  # rule-based candidates re-ranked per request
+PERSONALIZATION_REFRESH = 5.0  # seconds between neighbor-table refreshes
+METRICS_ENABLED = True  # per-stage timers; off makes them no-ops
+METRICS_PORT = 9100  # /metrics (Prometheus) and /metrics.json; None disables
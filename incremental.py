@@ -0,0 +1,215 @@
+import os
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from loader import Baskets, encode_baskets, parse_baskets, peak_memory_mb
+from mining import canonical_order, count_itemsets, mine_frequent_itemsets
+from ranking import Ranking
+from recommender import build_rec_index
+
+
+class IncrementalMiner:
+    # Keeps exact support counts for every frequent itemset and folds new
+    # baskets in FUP-style (Cheung et al., 1996): an itemset frequent in
+    # old + new baskets must be frequent in the old ones (so its count is
+    # already known) or in the new batch. Only itemsets that are frequent in
+    # the batch but unknown so far need a pass over the old baskets.
+    #
+    # Rules go through `ranking` like build_model()'s do. There is no
+    # sharded variant: ModelRefresher re-mines from scratch when SHARDING
+    # is set.
+
+    # Bytes before `offset` remembered to tell an appended file from a
+    # rewritten one.
+    TAIL = 4096
+
+    def __init__(self, baskets, min_support, min_threshold, max_len=None, miner="auto", ranking=None):
+        self.min_support = min_support
+        self.min_threshold = min_threshold
+        self.max_len = max_len
+        self.miner = miner
+        self.ranking = ranking or Ranking()
+        self.items = list(baskets.items)
+        self.ids = {p: i for i, p in enumerate(self.items)}
+        self.matrix = baskets.matrix.tocsr()
+        self.offset = 0  # bytes of the transactions file already folded in
+        self._tail = b""
+
+        freq_items = mine_frequent_itemsets(baskets, min_support, algorithm=miner, max_len=max_len)
+        n = len(baskets)
+        self.counts = {
+            self._key(s): int(round(sup * n))
+            for s, sup in zip(freq_items["itemsets"], freq_items["support"])
+        }
+        self.freq_items = freq_items
+        self.rules, self.score_col = self._rules(freq_items)
+        self.rec_index = build_rec_index(self.rules, self.score_col)
+
+    @classmethod
+    def from_file(cls, path, min_support, min_threshold, max_len=None, miner="auto", ranking=None):
+        offset = 0
+
+        def complete_lines():
+            nonlocal offset
+            with open(path, "rb") as f:
+                for raw in f:
+                    if not raw.endswith(b"\n"):
+                        break
+                    offset += len(raw)
+                    yield raw.decode("utf-8")
+
+        self = cls(encode_baskets(parse_baskets(complete_lines())), min_support, min_threshold, max_len, miner, ranking)
+        self.offset = offset
+        self._tail = _read_tail(path, offset, self.TAIL)
+        return self
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def poll(self, path):
+        # Folds in any complete lines appended to the file since the last
+        # call. A trailing line without a newline is left for next time.
+        # Returns None when the file was truncated or rewritten rather than
+        # appended to; the miner no longer matches it then.
+        if os.path.getsize(path) < self.offset or _read_tail(path, self.offset, self.TAIL) != self._tail:
+            return None
+        if os.path.getsize(path) == self.offset:
+            return set()
+        with open(path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1
+        if not end:
+            return set()
+        self.offset += end
+        self._tail = (self._tail + chunk[:end])[-self.TAIL:]
+        lines = chunk[:end].decode("utf-8").splitlines()
+        return self.add_baskets(parse_baskets(lines))
+
+    def to_model(self, key=None):
+        # The current state as a servable model_store.Model.
+        from model_store import Model
+        from rule_table import RuleTable
+
+        stats = {
+            "miner": "incremental",
+            "baskets": len(self),
+            "products": len(self.items),
+            "freq_itemsets": len(self.freq_items),
+            "rules_mined": self.rules_mined,
+            "rules": len(self.rules),
+            "peak_memory_mb": peak_memory_mb(),
+        }
+        names = sorted({p for s in self.freq_items["itemsets"] for p in s})
+        return Model(
+            key, self.rec_index, stats, freq_items=self.freq_items, rule_table=RuleTable.from_rules(self.rules, names),
+        )
+
+    def add_baskets(self, baskets):
+        # Returns the set of products whose recommendations changed.
+        batch = self._encode(baskets)
+        m = batch.shape[0]
+        if not m:
+            return set()
+        # Widen the old matrix for products first seen in this batch.
+        old = self.matrix
+        old = sparse.csr_matrix((old.data, old.indices, old.indptr), shape=(old.shape[0], len(self.items)))
+        self.matrix = sparse.vstack([old, batch], format="csr")
+        n = self.matrix.shape[0]
+
+        known = list(self.counts)
+        if known:
+            for key, inc in zip(known, count_itemsets(batch, known)):
+                self.counts[key] += int(inc)
+
+        # Candidates frequent within the batch but not tracked yet.
+        local = mine_frequent_itemsets(
+            Baskets(batch, self.items), self.min_support, algorithm=self.miner, max_len=self.max_len,
+        )
+        fresh = []
+        fresh_batch_counts = []
+        for s, sup in zip(local["itemsets"], local["support"]):
+            key = self._key(s)
+            if key not in self.counts:
+                fresh.append(key)
+                fresh_batch_counts.append(int(round(sup * m)))
+        if fresh:
+            old_counts = count_itemsets(old, fresh) if old.shape[0] else np.zeros(len(fresh), dtype=np.int64)
+            for key, c_old, c_new in zip(fresh, old_counts, fresh_batch_counts):
+                self.counts[key] = int(c_old) + c_new
+
+        self.counts = {k: c for k, c in self.counts.items() if c / n >= self.min_support}
+        freq_items = canonical_order(pd.DataFrame({
+            "support": np.array(list(self.counts.values()), dtype=np.float64) / n,
+            "itemsets": [frozenset(self.items[j] for j in k) for k in self.counts],
+        }))
+
+        # Every rule's support-based metrics move with the basket total, so
+        # the rule table is regenerated from the counts (no basket scan).
+        # Confidence only moves for rules touching changed counts, so the
+        # recommendation lookup is refreshed just for those products.
+        rules, score_col = self._rules(freq_items)
+        affected = _changed_products(self.rules, rules, score_col)
+        if affected:
+            involved = [
+                bool((a | c) & affected)
+                for a, c in zip(rules["antecedents"], rules["consequents"])
+            ]
+            partial = build_rec_index(rules[involved], score_col, products=affected)
+            self.rec_index = self.rec_index.replace_rows(partial, affected)
+        self.freq_items = freq_items
+        self.rules = rules
+        return affected
+
+    def _key(self, itemset):
+        return tuple(sorted(self.ids[p] for p in itemset))
+
+    def _encode(self, baskets):
+        indices, indptr = [], [0]
+        for basket in baskets:
+            for item in dict.fromkeys(basket):
+                code = self.ids.get(item)
+                if code is None:
+                    code = self.ids[item] = len(self.items)
+                    self.items.append(item)
+                indices.append(code)
+            if len(indices) > indptr[-1]:
+                indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(indices), dtype=bool), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, len(self.items)),
+        )
+        matrix.sort_indices()
+        return matrix
+
+    def _rules(self, freq_items):
+        from mlxtend.frequent_patterns import association_rules
+
+        # (ranked rules, score column), as in build_model().
+        rules = association_rules(freq_items, metric="confidence", min_threshold=self.min_threshold)
+        self.rules_mined = len(rules)
+        return self.ranking.apply(rules)
+
+
+def _read_tail(path, offset, size):
+    with open(path, "rb") as f:
+        f.seek(max(offset - size, 0))
+        return f.read(min(offset, size))
+
+
+def _changed_products(old, new, score_col="confidence", rtol=1e-12):
+    # Products that appear in a rule that was added, dropped or whose
+    # score changed. Scores are built from supports that are all divided
+    # by the basket total, so an unchanged count can still differ in the
+    # last bit; rtol absorbs that.
+    before = dict(zip(zip(old["antecedents"], old["consequents"]), old[score_col]))
+    after = dict(zip(zip(new["antecedents"], new["consequents"]), new[score_col]))
+    changed = set()
+    for key in before.keys() | after.keys():
+        a, b = before.get(key), after.get(key)
+        if a is None or b is None or abs(a - b) > rtol * abs(b):
+            changed.update(key[0])
+            changed.update(key[1])
+    return changed
@@ -0,0 +1,275 @@
+import argparse
+import math
+import random
+import sys
+import time
+from array import array
+from itertools import islice
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Baskets:
+    # Integer-coded basket matrix: one CSR row per basket, one column per
+    # product. Column j is the product items[j]; items are kept sorted so the
+    # columns line up with what TransactionEncoder used to produce.
+
+    def __init__(self, matrix, items):
+        self.matrix = matrix
+        self.items = list(items)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @property
+    def density(self):
+        rows, cols = self.matrix.shape
+        return self.matrix.nnz / float(rows * cols) if rows and cols else 0.0
+
+    def to_frame(self):
+        # Sparse boolean frame accepted by mlxtend's miners without densifying.
+        import pandas as pd
+
+        return pd.DataFrame.sparse.from_spmatrix(self.matrix, columns=self.items)
+
+
+def parse_baskets(lines):
+    # One de-duplicated item list per non-empty comma-separated line.
+    for line in lines:
+        items = dict.fromkeys(i.strip() for i in line.split(","))
+        items.pop("", None)
+        if items:
+            yield list(items)
+
+
+def read_baskets(path, chunk_size=100_000):
+    # Reads the file chunk_size lines at a time.
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            lines = list(islice(f, chunk_size))
+            if not lines:
+                break
+            yield from parse_baskets(lines)
+
+
+def sample_baskets(path, size, seed=None):
+    # Uniform sample of `size` baskets from the file in one pass, plus the
+    # total basket count. Reservoir sampling with Li's Algorithm L: the
+    # gaps between replacements are drawn directly, so only the lines that
+    # end up in the sample are parsed.
+    if size < 1:
+        raise ValueError(f"sample size must be positive, got {size}")
+    rng = random.Random(seed)
+    reservoir = []
+    n = 0
+    w = math.exp(math.log(1.0 - rng.random()) / size)
+    next_pick = size + _gap(rng, w)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip(" \t\r\n,"):
+                continue
+            if n < size:
+                reservoir.append(line)
+            elif n == next_pick:
+                reservoir[rng.randrange(size)] = line
+                w *= math.exp(math.log(1.0 - rng.random()) / size)
+                next_pick += _gap(rng, w) + 1
+            n += 1
+    return list(parse_baskets(reservoir)), n
+
+
+def _gap(rng, w):
+    if w >= 1.0:
+        return 0
+    return int(math.log(1.0 - rng.random()) / math.log1p(-w))
+
+
+def encode_baskets(baskets):
+    # scipy is imported here rather than at module level so that serving
+    # from a saved model does not pay for it.
+    from scipy import sparse
+
+    vocab = {}
+    indices = array("i")
+    indptr = array("q", [0])
+    for basket in baskets:
+        for item in basket:
+            code = vocab.get(item)
+            if code is None:
+                code = vocab[item] = len(vocab)
+            indices.append(code)
+        indptr.append(len(indices))
+
+    # Re-code products in sorted-name order.
+    items = sorted(vocab)
+    remap = np.empty(len(vocab), dtype=np.int32)
+    remap[[vocab[i] for i in items]] = np.arange(len(items), dtype=np.int32)
+    indices = remap[np.frombuffer(indices, dtype=np.int32)] if len(indices) else np.zeros(0, dtype=np.int32)
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=bool), indices, np.frombuffer(indptr, dtype=np.int64)),
+        shape=(len(indptr) - 1, len(items)),
+    )
+    matrix.sort_indices()
+    return Baskets(matrix, items)
+
+
+def load_baskets(path, chunk_size=100_000):
+    return encode_baskets(read_baskets(path, chunk_size))
+
+
+ORDER_LINE_SUFFIXES = (".parquet", ".pq")
+
+
+def read_order_lines(
+    path, products_path, order_col="order_id", product_col="product_id", min_size=2, chunk_rows=1_000_000,
+):
+    # Baskets from a long-format order-line export: one (order, product)
+    # row per line, CSV (optionally compressed) or Parquet. Returns
+    # (Baskets, report).
+    #
+    # Chunks are read with pandas / pyarrow and never parsed line by line
+    # in Python. Product ids are mapped to products.csv names in bulk, and
+    # rows with unknown products are dropped. All rows are then grouped by
+    # order with one sort. Repeated lines are merged, and orders with fewer
+    # than `min_size` known products are dropped before mining, so supports
+    # are relative to the orders kept. Integer order ids are used as they
+    # are; any other id type is coded in order of first appearance.
+    import pandas as pd
+    from scipy import sparse
+
+    start = time.perf_counter()
+    catalog = pd.read_csv(products_path, usecols=["product_id", "product_name"]).drop_duplicates("product_id")
+    ids = pd.Index(catalog["product_id"])
+    # Two ids with the same name are the same product, as in the catalog.
+    name_codes, names = pd.factorize(catalog["product_name"].astype(str))
+    name_codes = name_codes.astype(np.int32)
+    numeric_ids = pd.api.types.is_numeric_dtype(ids)
+
+    orders, codes = [], []
+    order_ids = None  # non-integer order id -> code
+    rows = dropped = 0
+    for chunk in _order_line_chunks(path, [order_col, product_col], chunk_rows):
+        rows += len(chunk)
+        product = chunk[product_col]
+        if numeric_ids and not pd.api.types.is_numeric_dtype(product):
+            product = pd.to_numeric(product, errors="coerce")
+        elif not numeric_ids:
+            product = product.astype(str)
+        found = ids.get_indexer(product)
+        keep = found >= 0
+
+        # Rows without an order id are dropped along with unknown products.
+        order = chunk[order_col].to_numpy()
+        if order_ids is None and order.dtype.kind in "iuf" and (orders or order.dtype.kind != "f"):
+            if order.dtype.kind == "f":  # integer ids with gaps read as float
+                keep &= ~np.isnan(order)
+                order = np.where(keep, order, 0)
+            order = order.astype(np.int64, copy=False)
+        else:
+            if order_ids is None:
+                if orders:
+                    raise ValueError(f"{path}: {order_col} changed from integers to {order.dtype}")
+                order_ids = {}
+            local, uniques = pd.factorize(order)
+            keep &= local >= 0
+            remap = np.fromiter((order_ids.setdefault(u, len(order_ids)) for u in uniques), np.int64, len(uniques))
+            order = remap[local] if len(uniques) else np.zeros(len(local), dtype=np.int64)
+        dropped += len(keep) - int(keep.sum())
+        orders.append(order[keep])
+        codes.append(name_codes[found[keep]])
+
+    order = np.concatenate(orders) if orders else np.zeros(0, dtype=np.int64)
+    code = np.concatenate(codes) if codes else np.zeros(0, dtype=np.int32)
+    # Orders become dense ranks (free when the export is already grouped by
+    # order), so (rank, product) fits one int64 key and a single sort groups
+    # the rows; equal neighbours are repeated lines.
+    if len(order) and np.all(order[1:] >= order[:-1]):
+        rank = np.r_[0, np.cumsum(order[1:] != order[:-1])]
+    else:
+        _, rank = np.unique(order, return_inverse=True)
+    width = max(len(names), 1)
+    key = rank.astype(np.int64) * width + code
+    key.sort()
+    key = key[np.r_[True, key[1:] != key[:-1]]] if len(key) else key
+    rank, code = np.divmod(key, width)
+    code = code.astype(np.int32)
+    starts = np.flatnonzero(np.r_[True, rank[1:] != rank[:-1]]) if len(rank) else np.zeros(0, dtype=np.int64)
+    sizes = np.diff(np.r_[starts, len(rank)])
+    kept = sizes >= min_size
+    code = code[np.repeat(kept, sizes)]
+    sizes = sizes[kept]
+
+    # Columns are the products used, in sorted-name order (see Baskets).
+    used = np.unique(code)
+    items = sorted(names[used].tolist())
+    column = np.full(len(names), -1, dtype=np.int32)
+    column[pd.Index(names).get_indexer(items)] = np.arange(len(items), dtype=np.int32)
+    indptr = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=indptr[1:])
+    matrix = sparse.csr_matrix(
+        (np.ones(len(code), dtype=bool), column[code], indptr), shape=(len(sizes), len(items)),
+    )
+    matrix.sort_indices()
+
+    seconds = time.perf_counter() - start
+    report = {
+        "rows": rows, "dropped_rows": dropped, "orders": len(kept), "tiny_orders": int((~kept).sum()),
+        "baskets": len(sizes), "products": len(items), "seconds": seconds,
+        "rows_per_sec": rows / seconds if seconds else 0.0,
+    }
+    return Baskets(matrix, items), report
+
+
+def _order_line_chunks(path, columns, chunk_rows):
+    import pandas as pd
+
+    if path.endswith(ORDER_LINE_SUFFIXES):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("reading Parquet order lines needs pyarrow (pip install pyarrow)") from None
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+
+
+def peak_memory_mb():
+    # Peak resident set size of this process so far, or None where the
+    # platform doesn't expose it.
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main(argv=None):
+    import config
+
+    parser = argparse.ArgumentParser(description="Ingest an order-line export and report throughput.")
+    parser.add_argument("path", help="CSV or Parquet with one (order, product id) row per line")
+    parser.add_argument("--products", default=config.PRODUCTS_PATH)
+    parser.add_argument("--order-column", default=config.ORDER_COLUMN)
+    parser.add_argument("--product-column", default=config.PRODUCT_COLUMN)
+    parser.add_argument("--min-size", type=int, default=config.MIN_BASKET_SIZE, help="smallest order kept")
+    parser.add_argument("--chunk-rows", type=int, default=config.INGEST_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    baskets, r = read_order_lines(
+        args.path, args.products, args.order_column, args.product_column, args.min_size, args.chunk_rows,
+    )
+    print(f"{r['rows']:,} rows in {r['seconds']:.2f}s ({r['rows_per_sec']:,.0f} rows/s), "
+          f"{r['dropped_rows']:,} dropped (unknown product or no order id)")
+    print(f"{r['orders']:,} orders, {r['tiny_orders']:,} below {args.min_size} products -> "
+          f"{len(baskets):,} baskets over {r['products']:,} products, peak memory {peak_memory_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
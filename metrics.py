@@ -0,0 +1,193 @@
+import bisect
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+# Per-stage latency histograms, counters and scrape-time gauges, exported as
+# Prometheus text or JSON. With ENABLED off, timed() hands back one shared
+# no-op context manager, so instrumented code pays a function call and no
+# clock reads.
+ENABLED = config.METRICS_ENABLED
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, math.inf,
+)
+
+_lock = threading.Lock()
+_histograms = {}  # stage -> Histogram
+_counters = {}    # name -> value
+_gauges = {}      # name -> callable returning a number or {label: number}
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation.
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, c in zip(BUCKETS, self.counts):
+            seen += c
+            if seen >= rank:
+                return bound
+        return math.inf
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL = _NullTimer()
+
+
+def timed(stage):
+    return _Timer(stage) if ENABLED else _NULL
+
+
+def observe(stage, seconds):
+    with _lock:
+        h = _histograms.get(stage)
+        if h is None:
+            h = _histograms[stage] = Histogram()
+        h.observe(seconds)
+
+
+def count(name, delta=1):
+    if ENABLED:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + delta
+
+
+def gauge(name, fn):
+    # `fn` runs on every scrape; return a number, or a dict for a labelled
+    # family ({"hits": 3, ...} becomes name{key="hits"}).
+    _gauges[name] = fn
+
+
+def enable(flag=True):
+    global ENABLED
+    ENABLED = flag
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def _gauge_values():
+    values = {}
+    for name, fn in list(_gauges.items()):
+        try:
+            values[name] = fn()
+        except Exception:
+            continue  # a broken gauge must not take the scrape down
+    return values
+
+
+def snapshot():
+    with _lock:
+        stages = {
+            stage: {
+                "count": h.count, "sum": h.sum,
+                "mean": h.sum / h.count if h.count else 0.0,
+                "p50": h.quantile(0.5), "p99": h.quantile(0.99),
+                "buckets": {str(b): c for b, c in zip(BUCKETS, h.counts)},
+            }
+            for stage, h in _histograms.items()
+        }
+        counters = dict(_counters)
+    return {"enabled": ENABLED, "stages": stages, "counters": counters, "gauges": _gauge_values()}
+
+
+def render_prometheus(prefix="shopsense"):
+    lines = []
+    with _lock:
+        histograms = {stage: (list(h.counts), h.sum, h.count) for stage, h in _histograms.items()}
+        counters = dict(_counters)
+    if histograms:
+        name = f"{prefix}_stage_seconds"
+        lines.append(f"# TYPE {name} histogram")
+        for stage, (counts, total, n) in sorted(histograms.items()):
+            cumulative = 0
+            for bound, c in zip(BUCKETS, counts):
+                cumulative += c
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total!r}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {n}')
+    for key, value in sorted(counters.items()):
+        lines.append(f"# TYPE {prefix}_{key}_total counter")
+        lines.append(f"{prefix}_{key}_total {value}")
+    for key, value in sorted(_gauge_values().items()):
+        lines.append(f"# TYPE {prefix}_{key} gauge")
+        if isinstance(value, dict):
+            for label, v in sorted(value.items()):
+                if v is not None:
+                    lines.append(f'{prefix}_{key}{{key="{label}"}} {float(v)!r}')
+        elif value is not None:
+            lines.append(f"{prefix}_{key} {float(value)!r}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body, ctype = render_prometheus().encode(), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, ctype = json.dumps(snapshot(), default=str).encode(), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port, host="127.0.0.1"):
+    # /metrics (Prometheus text) and /metrics.json on a daemon thread.
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,176 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from loader import Baskets
+
+# Vertical bitsets cost one bit per (basket, frequent product); above this
+# budget ECLAT is not considered by the auto-selector.
+ECLAT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def mine_apriori(baskets, min_support, max_len=None):
+    # mlxtend is imported on first use so serving never loads it.
+    from mlxtend.frequent_patterns import apriori
+
+    return apriori(baskets.to_frame(), min_support=min_support, use_colnames=True, max_len=max_len)
+
+
+def mine_fpgrowth(baskets, min_support, max_len=None):
+    from mlxtend.frequent_patterns import fpgrowth
+
+    return fpgrowth(baskets.to_frame(), min_support=min_support, use_colnames=True, max_len=max_len)
+
+
+def mine_eclat(baskets, min_support, max_len=None):
+    # Depth-first ECLAT over vertical tid-bitsets: each product's baskets are
+    # one Python int, so an itemset's support is the popcount of an AND.
+    n = len(baskets)
+    found = []
+    if not n:
+        return _to_frame(found, baskets.items, n)
+
+    csc = baskets.matrix.tocsc()
+    counts = np.diff(csc.indptr)
+    frequent = np.flatnonzero(counts / n >= min_support)
+    roots = [
+        (int(j), bits, int(counts[j]))
+        for j, bits in zip(frequent, column_bitsets(csc, frequent))
+    ]
+
+    def extend(prefix, candidates):
+        for pos, (item, bits, count) in enumerate(candidates):
+            itemset = prefix + (item,)
+            found.append((count, itemset))
+            if max_len and len(itemset) >= max_len:
+                continue
+            children = []
+            for other, other_bits, _ in candidates[pos + 1:]:
+                joined = bits & other_bits
+                joined_count = joined.bit_count()
+                if joined_count / n >= min_support:
+                    children.append((other, joined, joined_count))
+            if children:
+                extend(itemset, children)
+
+    extend((), roots)
+    return _to_frame(found, baskets.items, n)
+
+
+def column_bitsets(csc, columns):
+    # One Python int per column with bit i set when basket i holds the product.
+    n = csc.shape[0]
+    out = []
+    for j in columns:
+        mask = np.zeros(n, dtype=bool)
+        mask[csc.indices[csc.indptr[j]:csc.indptr[j + 1]]] = True
+        out.append(int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little"))
+    return out
+
+
+def count_itemsets(matrix, itemsets):
+    # Exact basket counts for the given itemsets (tuples of column ids).
+    csc = matrix.tocsc()
+    columns = sorted({j for s in itemsets for j in s})
+    bits = dict(zip(columns, column_bitsets(csc, columns)))
+    counts = np.empty(len(itemsets), dtype=np.int64)
+    for i, s in enumerate(itemsets):
+        acc = bits[s[0]]
+        for j in s[1:]:
+            acc &= bits[j]
+        counts[i] = acc.bit_count()
+    return counts
+
+
+def _to_frame(found, items, n):
+    return pd.DataFrame({
+        "support": np.array([c for c, _ in found], dtype=np.float64) / n if n else np.zeros(0),
+        "itemsets": [frozenset(items[j] for j in s) for _, s in found],
+    })
+
+
+MINERS = {
+    "apriori": mine_apriori,
+    "fpgrowth": mine_fpgrowth,
+    "eclat": mine_eclat,
+}
+
+
+def choose_miner(baskets, min_support):
+    rows, cols = baskets.matrix.shape
+    if not rows or not cols:
+        return "apriori"
+    density = baskets.density
+    # Only products that can be frequent get a bitset.
+    col_support = np.asarray(baskets.matrix.sum(axis=0)).ravel() / rows
+    bitset_bytes = int((col_support >= min_support).sum()) * rows / 8
+    if bitset_bytes <= ECLAT_MAX_BYTES and (density >= 0.01 or rows <= 100_000):
+        # Dense enough (or small enough) that tidset intersections beat
+        # repeated horizontal scans.
+        return "eclat"
+    if density < 0.01 and min_support >= 0.01:
+        # Sparse data with a high threshold: Apriori's candidate sets stay tiny.
+        return "apriori"
+    # Large, low-support workloads: FP-Growth avoids candidate generation.
+    return "fpgrowth"
+
+
+def mine_frequent_itemsets(baskets, min_support, algorithm="auto", max_len=None, workers=1):
+    if algorithm == "auto":
+        algorithm = choose_miner(baskets, min_support)
+    if algorithm not in MINERS:
+        raise ValueError(f"Unknown mining algorithm: {algorithm!r} (choose from {sorted(MINERS)})")
+    if workers > 1 and len(baskets) >= 2 * workers:
+        freq_items = mine_son(baskets, min_support, algorithm, max_len, workers)
+    else:
+        freq_items = MINERS[algorithm](baskets, min_support, max_len)
+    return canonical_order(freq_items)
+
+
+def mine_son(baskets, min_support, algorithm, max_len=None, workers=2):
+    # SON / partition algorithm (Savasere, Omiecinski & Navathe, 1995).
+    # Pass 1 mines each shard of baskets locally; any globally frequent
+    # itemset is frequent in at least one shard, so the union of the local
+    # results is a complete candidate set. Pass 2 counts every candidate
+    # exactly on every shard and keeps those frequent overall.
+    n = len(baskets)
+    bounds = np.linspace(0, n, workers + 1).astype(int)
+    shards = [baskets.matrix[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+    # A hair under min_support so float rounding at a shard boundary can
+    # never drop a true candidate; pass 2 applies the exact threshold.
+    local_support = min_support * (1 - 1e-9)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        local = pool.map(
+            _mine_shard, shards,
+            [baskets.items] * workers, [local_support] * workers,
+            [algorithm] * workers, [max_len] * workers,
+        )
+        candidates = sorted(set().union(*local))
+        if not candidates:
+            return _to_frame([], baskets.items, n)
+        counts = sum(pool.map(count_itemsets, shards, [candidates] * workers))
+
+    found = [(int(c), s) for c, s in zip(counts, candidates) if c / n >= min_support]
+    return _to_frame(found, baskets.items, n)
+
+
+def _mine_shard(matrix, items, min_support, algorithm, max_len):
+    ids = {p: i for i, p in enumerate(items)}
+    freq_items = MINERS[algorithm](Baskets(matrix, items), min_support, max_len)
+    return {tuple(sorted(ids[p] for p in s)) for s in freq_items["itemsets"]}
+
+
+def canonical_order(freq_items):
+    # Every backend emits itemsets in its own order, and the order of
+    # freq_items decides the order of association_rules() output (and so
+    # recommendation tie-breaks). Normalise to Apriori's order: by length,
+    # then by sorted product names. The frozensets are rebuilt in sorted
+    # insertion order too, since association_rules() enumerates each
+    # itemset's antecedents in the set's iteration order.
+    keys = [(len(s), tuple(sorted(s))) for s in freq_items["itemsets"]]
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    freq_items = freq_items.iloc[order].reset_index(drop=True)
+    freq_items["itemsets"] = [frozenset(keys[i][1]) for i in order]
+    return freq_items
@@ -0,0 +1,358 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+import config
+import metrics
+from loader import ORDER_LINE_SUFFIXES, load_baskets, peak_memory_mb, read_order_lines
+from ranking import Ranking
+from recommender import BasketScorer, RecIndex, ShardedIndex, build_rec_index
+from rule_table import RuleTable, decode_sets, encode_sets
+from sharding import Sharding, load_categories
+
+# Bump whenever the on-disk layout changes so stale artifacts are rebuilt.
+FORMAT_VERSION = 5
+
+
+class Model:
+    # Everything the app serves from: the recommendation index plus the
+    # mined itemsets and rules. Rules are held as a compact RuleTable (see
+    # rule_table.py); a model loaded from disk also keeps the itemsets as
+    # flat arrays. The DataFrames are only rebuilt on access.
+
+    def __init__(self, key, rec_index, stats, freq_items=None, rules=None, arrays=None, rule_table=None):
+        self.key = key
+        self.rec_index = rec_index
+        self.stats = stats
+        self._freq_items = freq_items
+        self._rules = rules
+        self._arrays = arrays
+        self._rule_table = rule_table
+        self._basket_scorer = None
+
+    @property
+    def freq_items(self):
+        if self._freq_items is None:
+            import pandas as pd
+
+            a = self._arrays
+            self._freq_items = pd.DataFrame({
+                "support": np.asarray(a["itemset_support"]),
+                "itemsets": decode_sets(self.rule_table.names, a["itemset_offsets"], a["itemset_items"]),
+            })
+        return self._freq_items
+
+    @property
+    def rule_table(self):
+        if self._rule_table is None:
+            self._rule_table = RuleTable.from_rules(self._rules)
+        return self._rule_table
+
+    @property
+    def rules(self):
+        if self._rules is None:
+            self._rules = self.rule_table.to_frame()
+        return self._rules
+
+    @property
+    def basket_scorer(self):
+        if self._basket_scorer is None:
+            # Straight from the rule table's CSR arrays, no frozensets needed.
+            t = self.rule_table
+            self._basket_scorer = BasketScorer.from_csr(
+                t.names,
+                np.asarray(t.ant_offsets), np.asarray(t.ant_items),
+                np.asarray(t.cons_offsets), np.asarray(t.cons_items),
+                t.column("confidence"), t.column("lift"),
+            )
+        return self._basket_scorer
+
+    def memory_usage(self):
+        # Bytes held by the recommendation index and by whichever forms of
+        # the itemsets and rules are loaded. Memory-mapped arrays count in
+        # full even though only touched pages are resident; DataFrames are
+        # measured shallowly (frozensets are not walked).
+        usage = {"rec_index": self.rec_index.nbytes}
+        if self._arrays is not None:
+            usage["arrays"] = sum(a.nbytes for a in self._arrays.values() if isinstance(a, np.ndarray))
+        if self._rule_table is not None:
+            usage["rule_table"] = self._rule_table.nbytes
+        if self._rules is not None:
+            usage["rules"] = int(self._rules.memory_usage(index=True).sum())
+        if self._freq_items is not None:
+            usage["freq_items"] = int(self._freq_items.memory_usage(index=True).sum())
+        return usage
+
+
+def model_key(transactions_path, min_support, min_threshold, max_len=None, ranking=None, sharding=None):
+    h = hashlib.blake2b(digest_size=16)
+    with open(transactions_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    params = {
+        "format": FORMAT_VERSION,
+        "min_support": min_support,
+        "min_threshold": min_threshold,
+        "max_len": max_len,
+    }
+    # Left out when unset so default-ranked artifacts keep their keys.
+    if ranking is not None and not ranking.is_default:
+        params["ranking"] = ranking.params()
+    if sharding is not None:
+        params["sharding"] = sharding.params()
+    order_lines = order_line_params(transactions_path)
+    if order_lines is not None:
+        params["order_lines"] = order_lines
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def is_order_lines(transactions_path):
+    return config.ORDER_LINES or transactions_path.endswith(ORDER_LINE_SUFFIXES)
+
+
+def order_line_params(transactions_path):
+    # What turns an order-line export into baskets, products.csv included
+    # since it decides which product ids are known.
+    if not is_order_lines(transactions_path):
+        return None
+    with open(config.PRODUCTS_PATH, "rb") as f:
+        products = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+    return {
+        "order_column": config.ORDER_COLUMN, "product_column": config.PRODUCT_COLUMN,
+        "min_basket_size": config.MIN_BASKET_SIZE, "products": products,
+    }
+
+
+def load_transactions(transactions_path):
+    # Baskets plus ingestion stats (empty for transactions.csv).
+    if not is_order_lines(transactions_path):
+        return load_baskets(transactions_path), {}
+    baskets, report = read_order_lines(
+        transactions_path, config.PRODUCTS_PATH, config.ORDER_COLUMN, config.PRODUCT_COLUMN,
+        config.MIN_BASKET_SIZE, config.INGEST_CHUNK_ROWS,
+    )
+    return baskets, {
+        "order_lines": report["rows"], "dropped_rows": report["dropped_rows"],
+        "tiny_orders": report["tiny_orders"], "ingest_rows_per_sec": round(report["rows_per_sec"]),
+    }
+
+
+def build_model(
+    baskets, min_support, min_threshold, miner="auto", max_len=None, key=None, workers=1, ranking=None, sharding=None,
+):
+    # The miners and association_rules are only needed when mining.
+    from mlxtend.frequent_patterns import association_rules
+
+    from mining import choose_miner, mine_frequent_itemsets
+
+    shard_stats = {}
+    if sharding is not None:
+        # Each shard picks its own miner when miner is "auto".
+        with metrics.timed("mine"):
+            freq_items, shard_stats = sharding.mine(baskets, min_support, miner, max_len, workers)
+    else:
+        miner = choose_miner(baskets, min_support) if miner == "auto" else miner
+        with metrics.timed("mine"):
+            freq_items = mine_frequent_itemsets(baskets, min_support, algorithm=miner, max_len=max_len, workers=workers)
+    with metrics.timed("association_rules"):
+        rules = association_rules(freq_items, metric="confidence", min_threshold=min_threshold)
+    rules_mined = len(rules)
+    with metrics.timed("rank_rules"):
+        rules, score_col = (ranking or Ranking()).apply(rules)
+    stats = {
+        "miner": miner,
+        "baskets": len(baskets),
+        "products": len(baskets.items),
+        "freq_itemsets": len(freq_items),
+        "rules_mined": rules_mined,
+        "rules": len(rules),
+        "peak_memory_mb": peak_memory_mb(),
+        **shard_stats,
+    }
+    with metrics.timed("build_index"):
+        rec_index = sharding.build_index(rules, score_col) if sharding is not None else build_rec_index(rules, score_col)
+    # The DataFrame is dropped: the table holds the same rules in a
+    # fraction of the memory and rebuilds the frame if anyone asks.
+    with metrics.timed("rule_table"):
+        names = sorted({p for s in freq_items["itemsets"] for p in s})
+        rule_table = RuleTable.from_rules(rules, names)
+    return Model(key, rec_index, stats, freq_items=freq_items, rule_table=rule_table)
+
+
+def save_model(model, root=config.MODEL_DIR):
+    # Itemsets share the rule table's product table, which has to cover
+    # every product of every itemset.
+    items = sorted({p for s in model.freq_items["itemsets"] for p in s})
+    table = model.rule_table
+    if table.names != items:
+        table = RuleTable.from_rules(model.rules, items)
+    ids = {p: i for i, p in enumerate(items)}
+    arrays = {}
+    arrays["itemset_offsets"], arrays["itemset_items"] = encode_sets(model.freq_items["itemsets"], ids)
+    arrays["itemset_support"] = model.freq_items["support"].to_numpy(dtype=np.float64)
+    if isinstance(model.rec_index, ShardedIndex):
+        indexes = list(zip([f"shard{i}_index" for i in range(len(model.rec_index.shards))], model.rec_index.shards))
+    else:
+        indexes = [("index", model.rec_index)]
+    for prefix, index in indexes:
+        arrays[prefix + "_offsets"] = index.offsets
+        arrays[prefix + "_targets"] = index.targets
+        arrays[prefix + "_scores"] = index.scores
+        arrays[prefix + "_confidences"] = index.confidences
+        arrays[prefix + "_lifts"] = index.lifts
+
+    meta = {
+        "format": FORMAT_VERSION,
+        "key": model.key,
+        "created": time.time(),
+        "stats": model.stats,
+    }
+    if isinstance(model.rec_index, ShardedIndex):
+        meta["index_shards"] = [
+            {"name": name, "names": shard.names}
+            for name, shard in zip(model.rec_index.shard_names, model.rec_index.shards)
+        ]
+    else:
+        meta["index_names"] = model.rec_index.names
+
+    # Write into a scratch directory and rename it into place, so readers
+    # never see a half-written artifact. The key covers the content, so an
+    # artifact already in place (written by another process, say) is kept
+    # as is rather than replaced under its readers.
+    os.makedirs(root, exist_ok=True)
+    final = os.path.join(root, model.key)
+    if not os.path.exists(os.path.join(final, "meta.json")):
+        tmp = final + f".tmp{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp, name + ".npy"), np.ascontiguousarray(arr))
+        table.save(tmp, prefix="rules")
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        try:
+            os.replace(tmp, final)
+        except OSError:
+            # Another process renamed the same artifact into place first.
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.exists(os.path.join(final, "meta.json")):
+                raise
+
+    # Only the newest artifact is ever loaded; drop the other finished ones.
+    # Scratch directories belong to writers that may still be running.
+    for name in os.listdir(root):
+        if name != model.key and ".tmp" not in name:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return final
+
+
+def load_model(key, root=config.MODEL_DIR):
+    path = os.path.join(root, key)
+    try:
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != FORMAT_VERSION:
+        return None
+
+    arrays = {}
+    for name in os.listdir(path):
+        if name.endswith(".npy") and not name.startswith(("rules_", "topk_")):
+            arrays[name[:-4]] = np.load(os.path.join(path, name), mmap_mode="r")
+    if "index_shards" in meta:
+        rec_index = ShardedIndex([s["name"] for s in meta["index_shards"]], [
+            _load_index(s["names"], arrays, f"shard{i}_index") for i, s in enumerate(meta["index_shards"])
+        ])
+    else:
+        rec_index = _load_index(meta["index_names"], arrays, "index")
+    return Model(key, rec_index, meta["stats"], arrays=arrays, rule_table=RuleTable.load(path, prefix="rules"))
+
+
+def _load_index(names, arrays, prefix):
+    return RecIndex(
+        names, arrays[prefix + "_offsets"], arrays[prefix + "_targets"],
+        arrays[prefix + "_scores"], arrays[prefix + "_lifts"], arrays[prefix + "_confidences"],
+    )
+
+
+def load_or_build_model(
+    transactions_path=config.TRANSACTIONS_PATH,
+    min_support=config.MIN_SUPPORT,
+    min_threshold=config.MIN_THRESHOLD,
+    miner=config.MINER,
+    max_len=config.MAX_LEN,
+    root=config.MODEL_DIR,
+    force=False,
+    workers=config.MINING_WORKERS,
+    ranking=Ranking.from_config(),
+    sharding=Sharding.from_config(),
+):
+    key = model_key(transactions_path, min_support, min_threshold, max_len, ranking, sharding)
+    with metrics.timed("load_model"):
+        model = None if force else load_model(key, root)
+    if model is None:
+        # CSV parsing and encoding are streamed together.
+        with metrics.timed("load_baskets"):
+            baskets, ingest = load_transactions(transactions_path)
+        model = build_model(
+            baskets, min_support, min_threshold, miner, max_len, key=key, workers=workers, ranking=ranking,
+            sharding=sharding,
+        )
+        model.stats.update(ingest)
+        try:
+            with metrics.timed("save_model"):
+                save_model(model, root)
+        except OSError:
+            # The artifact is only a cache; a read-only disk just means we
+            # mine again next start.
+            pass
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the ShopSense recommendation model artifact.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="mine transactions and write the model artifact")
+    build.add_argument("--transactions", default=config.TRANSACTIONS_PATH)
+    build.add_argument("--min-support", type=float, default=config.MIN_SUPPORT)
+    build.add_argument("--min-threshold", type=float, default=config.MIN_THRESHOLD)
+    build.add_argument("--miner", default=config.MINER)
+    build.add_argument("--max-len", type=int, default=config.MAX_LEN)
+    build.add_argument("--workers", type=int, default=config.MINING_WORKERS, help="processes for SON parallel mining")
+    build.add_argument("--rank-by", default=config.RANK_BY, help="confidence, lift, leverage, conviction or blend")
+    build.add_argument("--top-k", type=int, default=config.RULES_PER_ANTECEDENT, help="rules kept per antecedent")
+    build.add_argument("--prune", action="store_true", default=config.PRUNE_REDUNDANT, help="drop redundant rules")
+    build.add_argument("--shard", choices=["category", "hierarchical"], default=config.SHARDING,
+                       help="mine rules per category shard (see sharding.py)")
+    build.add_argument("--products", default=config.PRODUCTS_PATH,
+                       help="products.csv (categories for --shard, product ids for --order-lines)")
+    build.add_argument("--order-lines", action="store_true", default=config.ORDER_LINES,
+                       help="transactions are (order_id, product_id) rows (see loader.read_order_lines)")
+    build.add_argument("--out", default=config.MODEL_DIR)
+    build.add_argument("--force", action="store_true", help="rebuild even if an up-to-date artifact exists")
+    args = parser.parse_args(argv)
+
+    config.ORDER_LINES = args.order_lines
+    config.PRODUCTS_PATH = args.products
+    start = time.perf_counter()
+    model = load_or_build_model(
+        args.transactions, args.min_support, args.min_threshold,
+        args.miner, args.max_len, args.out, force=args.force, workers=args.workers,
+        ranking=Ranking(args.rank_by, config.RANK_WEIGHTS, args.top_k, args.prune),
+        sharding=Sharding(args.shard, load_categories(args.products)) if args.shard else None,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"Model {model.key} ready in {elapsed:.2f}s")
+    for k, v in model.stats.items():
+        print(f"  {k}: {v}")
+
+
+if __name__ == "__main__":
+    main()
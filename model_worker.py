@@ -0,0 +1,158 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+from model_store import is_order_lines, load_model, load_or_build_model, model_key, save_model
+from ranking import Ranking
+from sharding import Sharding
+
+
+class ModelHolder:
+    # The model currently being served. Handlers read `holder.model` once per
+    # request and use that object throughout, so a swap never changes the
+    # model under a request in flight; models are never mutated after they
+    # are built, and replacing the reference is atomic.
+
+    # `model` may start as None while the first model loads in the
+    # background; `ready` is set by the first swap.
+
+    def __init__(self, model=None):
+        self.model = model
+        self.version = 0
+        self.listeners = []  # called with (old, new) after every swap
+        self.ready = threading.Event()
+        if model is not None:
+            self.ready.set()
+        self._lock = threading.Lock()
+
+    def swap(self, model):
+        with self._lock:
+            old, self.model = self.model, model
+            self.version += 1
+        self.ready.set()
+        for listener in self.listeners:
+            listener(old, model)
+        return old
+
+
+class ModelRefresher:
+    # Background thread that re-mines when transactions.csv changes. Mining
+    # runs in a child process (it writes the artifact to `root`), so the
+    # server's threads and event loop keep running at full speed; the parent
+    # only mmap-loads the finished artifact and swaps it in.
+    #
+    # With `incremental`, lines appended to transactions.csv are folded
+    # into an IncrementalMiner (incremental.py) on this thread instead.
+    # The first change mines the whole file once, in the child process like
+    # a full rebuild, which sends the seeded miner back; after that only the
+    # appended lines are counted. A rewritten
+    # or truncated file, SHARDING and order-line exports all go back to a
+    # full re-mine in the child process.
+
+    def __init__(
+        self, holder, transactions_path=config.TRANSACTIONS_PATH, interval=config.REFRESH_INTERVAL,
+        min_support=config.MIN_SUPPORT, min_threshold=config.MIN_THRESHOLD, miner=config.MINER,
+        max_len=config.MAX_LEN, root=config.MODEL_DIR, workers=config.MINING_WORKERS, ranking=None, sharding=None,
+        incremental=config.INCREMENTAL_REFRESH,
+    ):
+        self.holder = holder
+        self.transactions_path = transactions_path
+        self.interval = interval
+        self.params = (
+            min_support, min_threshold, miner, max_len, root, workers,
+            ranking or Ranking.from_config(), sharding or Sharding.from_config(),
+        )
+        self.root = root
+        self.incremental = incremental and self.params[-1] is None and not is_order_lines(transactions_path)
+        self._miner = None
+        self.last_error = None
+        self._seen = self._stamp()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stamp(self):
+        try:
+            st = os.stat(self.transactions_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def check(self, force=False):
+        # Rebuilds and swaps if the transactions (or mining parameters)
+        # no longer match the served model. Returns True after a swap.
+        current = self.holder.model
+        stamp = self._stamp()
+        if current is None or stamp is None or (stamp == self._seen and not force):
+            return False  # first load still running, or nothing new
+        self._seen = stamp
+        min_support, min_threshold, miner, max_len, root, workers, ranking, sharding = self.params
+        if model_key(self.transactions_path, min_support, min_threshold, max_len, ranking, sharding) == current.key:
+            return False
+        try:
+            model = self._fold_in() if self.incremental else None
+            if model is None:
+                with ProcessPoolExecutor(1) as pool:
+                    key = pool.submit(_build, self.transactions_path, *self.params).result()
+                model = load_model(key, root)
+            if model is None:
+                raise OSError(f"model artifact {key} was not written to {root}")
+        except Exception as e:
+            # Keep serving the previous model; retry on the next change.
+            self.last_error = e
+            return False
+        self.last_error = None
+        self.holder.swap(model)
+        return True
+
+    def _fold_in(self):
+        # The incremental model, or None to fall back to a full re-mine.
+        from incremental import IncrementalMiner
+
+        min_support, min_threshold, miner, max_len, root, workers, ranking, sharding = self.params
+        if self._miner is not None and self._miner.poll(self.transactions_path) is None:
+            self._miner = None  # rewritten, not appended
+            return None
+        if self._miner is None:
+            with ProcessPoolExecutor(1) as pool:
+                self._miner = pool.submit(
+                    IncrementalMiner.from_file, self.transactions_path, min_support, min_threshold, max_len, miner,
+                    ranking,
+                ).result()
+        model = self._miner.to_model(model_key(self.transactions_path, min_support, min_threshold, max_len, ranking))
+        # A trailing line without its newline is not folded in yet, so the
+        # model does not match the file's key and is only cached on disk
+        # once it does.
+        if self._miner.offset == os.path.getsize(self.transactions_path):
+            try:
+                save_model(model, root)
+            except OSError:
+                pass
+        return model
+
+    def retry(self):
+        # Makes the next check rebuild even if transactions.csv has not
+        # changed, e.g. after the first load failed.
+        self._seen = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def _build(transactions_path, min_support, min_threshold, miner, max_len, root, workers, ranking, sharding):
+    return load_or_build_model(
+        transactions_path, min_support, min_threshold, miner, max_len, root, workers=workers, ranking=ranking,
+        sharding=sharding,
+    ).key
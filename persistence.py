@@ -0,0 +1,194 @@
+import atexit
+import sqlite3
+import threading
+
+from session_store import hash_plaintext_passwords
+
+
+_UPSERT_COUNTER = (
+    "INSERT INTO counters VALUES (?, ?, ?) "
+    "ON CONFLICT (product, counter) DO UPDATE SET delta = delta + excluded.delta"
+)
+
+
+def _apply(conn, change):
+    if change[0] == "counter":
+        conn.execute(_UPSERT_COUNTER, change[1:])
+    elif change[0] == "user":
+        conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", change[1:])
+        conn.execute("DELETE FROM items WHERE username = ?", (change[1],))
+    else:
+        conn.execute("INSERT INTO items (username, kind, product) VALUES (?, ?, ?)", change[1:])
+
+
+class StateJournal:
+    # Durable log of popularity counters and session lists. Clicks only
+    # touch in-memory buffers; a background thread writes them to a SQLite
+    # (WAL) file every `flush_interval` seconds, or sooner once `flush_size`
+    # changes are pending. Each flush is one transaction, so after a crash
+    # the file holds exactly the batches that were committed and at most
+    # the last interval of clicks is lost.
+    #
+    # Counters are stored as deltas on top of products.csv, so editing the
+    # catalog file keeps its values and adds the recorded clicks on top.
+
+    def __init__(self, path, flush_interval=2.0, flush_size=500):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._counters = {}  # (product, counter) -> pending delta
+        self._events = []    # ("user", name, password hash) / ("item", name, kind, product), in order
+        self._pending = 0
+        self.rejected = []  # (event, error) for changes the database refused, newest last
+        self.rejected_count = 0
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS counters (
+                product TEXT NOT NULL,
+                counter TEXT NOT NULL,
+                delta INTEGER NOT NULL,
+                PRIMARY KEY (product, counter)
+            );
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                product TEXT NOT NULL
+            );
+        """)
+        # Passwords are stored as the session store's salted hashes.
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            hash_plaintext_passwords(self._conn)
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def restore_catalog(self, catalog):
+        for product, counter, delta in self._conn.execute("SELECT product, counter, delta FROM counters"):
+            catalog.increment(product, counter, delta)
+
+    def restore_sessions(self, store):
+        for username, password_hash in self._conn.execute("SELECT username, password FROM users"):
+            store.restore_user(username, password_hash)
+        for username, kind, product in self._conn.execute("SELECT username, kind, product FROM items ORDER BY seq"):
+            store.add_item(username, kind, product)
+
+    def add_counter(self, product, counter, delta=1):
+        with self._lock:
+            key = (product, counter)
+            self._counters[key] = self._counters.get(key, 0) + delta
+            self._bump()
+
+    def add_user(self, username, password_hash):
+        with self._lock:
+            self._events.append(("user", username, password_hash))
+            self._bump()
+
+    def add_item(self, username, kind, product):
+        if not product:
+            return
+        with self._lock:
+            self._events.append(("item", username, kind, product))
+            self._bump()
+
+    def _bump(self):
+        self._pending += 1
+        if self._pending >= self.flush_size:
+            self._wake.set()
+
+    def flush(self):
+        # Writes everything buffered so far. On failure the batch is put
+        # back in front of anything buffered meanwhile and retried later.
+        # A batch refused by a constraint (IntegrityError) would fail the
+        # same way forever, so it is written again change by change and
+        # the offending changes are set aside in `rejected`.
+        with self._flush_lock:
+            with self._lock:
+                counters, events = self._counters, self._events
+                self._counters, self._events, self._pending = {}, [], 0
+            if not counters and not events:
+                return 0
+            try:
+                try:
+                    self._write(counters, events)
+                except sqlite3.IntegrityError:
+                    self._write(counters, events, isolate=True)
+            except sqlite3.Error:
+                with self._lock:
+                    for key, delta in self._counters.items():
+                        counters[key] = counters.get(key, 0) + delta
+                    self._counters, self._events = counters, events + self._events
+                    self._pending = len(self._counters) + len(self._events)
+                raise
+            return len(counters) + len(events)
+
+    def _write(self, counters, events, isolate=False):
+        # With `isolate`, each change runs in its own savepoint and one that
+        # violates a constraint is rejected instead of failing the batch.
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not isolate:
+                conn.executemany(_UPSERT_COUNTER, [(p, c, d) for (p, c), d in counters.items()])
+                for event in events:
+                    _apply(conn, event)
+            else:
+                for change in [("counter", p, c, d) for (p, c), d in counters.items()] + events:
+                    conn.execute("SAVEPOINT change")
+                    try:
+                        _apply(conn, change)
+                    except sqlite3.IntegrityError as e:
+                        conn.execute("ROLLBACK TO change")
+                        self._reject(change, e)
+                    conn.execute("RELEASE change")
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _reject(self, change, error):
+        self.rejected_count += 1
+        self.rejected.append((change, str(error)))
+        del self.rejected[:-100]
+
+    def start(self):
+        # Starts the background flusher; close() (also run at exit) stops
+        # it and writes whatever is still buffered.
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="state-journal", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # kept in the buffer, retried on the next tick
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        self._conn.close()
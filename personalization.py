@@ -0,0 +1,191 @@
+import threading
+
+import numpy as np
+
+
+class Personalizer:
+    # Item-item cosine similarity over a weighted user x item matrix X built
+    # from each user's liked / cart / recently viewed lists (a product's
+    # weight is the sum of the weights of the lists it is in).
+    #
+    # The co-occurrence matrix C = X^T X is kept up to date incrementally:
+    # refresh() only looks at users whose rows changed since the last call
+    # and adds X_new^T X_new - X_old^T X_old over those rows, two sparse
+    # products whose cost does not depend on the total number of users.
+    # Neighbor lists (top_n most similar products) are then recomputed just
+    # for the rows whose similarities moved. Requests only read the
+    # neighbor table, so their cost is O(history x top_n).
+
+    def __init__(self, weights=None, top_n=20, history=50):
+        self.weights = dict(weights or {"liked": 3.0, "cart": 2.0, "recent": 1.0})
+        self.top_n = top_n
+        self.history = history  # most recent products per user used for scoring
+        self.ids = {}
+        self.names = []
+        self.version = 0  # bumped by every refresh that changed the table
+        self._lock = threading.RLock()
+        self._users = {}    # user -> {item id: set of list kinds}
+        self._order = {}    # user -> {item id: None}, oldest first
+        self._before = {}   # user -> row values before the first pending change
+        self._co = None     # C as a CSR matrix, grown as products appear
+        self._neighbors = {}  # item id -> (neighbor ids, similarities), best first
+        self._stop = threading.Event()
+
+    def __len__(self):
+        return len(self._users)
+
+    @property
+    def pending(self):
+        return len(self._before)
+
+    def _row(self, user):
+        kinds = self._users.get(user, {})
+        return {i: sum(self.weights.get(k, 0.0) for k in ks) for i, ks in kinds.items()}
+
+    def _touch(self, user):
+        if user not in self._before:
+            self._before[user] = self._row(user)
+
+    def record(self, user, kind, product):
+        with self._lock:
+            i = self.ids.get(product)
+            if i is None:
+                i = self.ids[product] = len(self.names)
+                self.names.append(product)
+            kinds = self._users.setdefault(user, {}).setdefault(i, set())
+            order = self._order.setdefault(user, {})
+            order.pop(i, None)
+            order[i] = None
+            if kind not in kinds:
+                self._touch(user)
+                kinds.add(kind)
+
+    def reset_user(self, user):
+        with self._lock:
+            if self._users.get(user):
+                self._touch(user)
+            self._users[user] = {}
+            self._order[user] = {}
+
+    def refresh(self):
+        # Folds pending user changes into C and the neighbor table. Returns
+        # the number of products whose neighbor lists were recomputed.
+        with self._lock:
+            before, self._before = self._before, {}
+            if not before:
+                return 0
+            from scipy import sparse
+
+            n = len(self.names)
+            users = list(before)
+            old = _rows_matrix([before[u] for u in users], n)
+            new = _rows_matrix([self._row(u) for u in users], n)
+            delta = (new.T @ new - old.T @ old).tocsr()
+            delta.eliminate_zeros()
+            co = self._co
+            if co is None:
+                co = sparse.csr_matrix((n, n))
+            elif co.shape[0] < n:
+                co = sparse.csr_matrix((co.data, co.indices, co.indptr), shape=(co.shape[0], n))
+                co = sparse.vstack([co, sparse.csr_matrix((n - co.shape[0], n))], format="csr")
+            co = (co + delta).tocsr()
+            co.eliminate_zeros()
+            self._co = co
+
+            # A product's self co-occurrence is its squared norm; when that
+            # moves, every similarity involving it moves too. C is
+            # symmetric, so the products co-occurring with the changed ones
+            # are the columns of their rows.
+            changed = np.unique(delta.tocoo().row)
+            if not len(changed):
+                return 0
+            dirty = np.unique(np.r_[changed, co[changed].indices])
+            self._recompute(dirty)
+            self.version += 1
+            return len(dirty)
+
+    def _recompute(self, rows):
+        co = self._co
+        norms = np.sqrt(np.maximum(co.diagonal(), 0.0))
+        sub = co[rows].tocsr()
+        for r, i in enumerate(rows):
+            lo, hi = sub.indptr[r], sub.indptr[r + 1]
+            cols, vals = sub.indices[lo:hi], sub.data[lo:hi]
+            keep = (cols != i) & (vals > 0)
+            cols, vals = cols[keep], vals[keep]
+            if not len(cols) or norms[i] == 0:
+                self._neighbors.pop(int(i), None)
+                continue
+            sims = vals / (norms[i] * norms[cols])
+            if len(sims) > self.top_n:
+                top = np.argpartition(-sims, self.top_n)[:self.top_n]
+                cols, sims = cols[top], sims[top]
+            order = np.lexsort((cols, -sims))
+            self._neighbors[int(i)] = (cols[order], sims[order])
+
+    def start(self, interval):
+        # Refreshes every `interval` seconds on a daemon thread.
+        def run():
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        threading.Thread(target=run, name="personalizer", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def similar(self, product, n=None):
+        i = self.ids.get(product)
+        if i is None or i not in self._neighbors:
+            return []
+        cols, sims = self._neighbors[i]
+        return [(self.names[j], float(s)) for j, s in zip(cols[:n], sims[:n])]
+
+    def scores(self, user):
+        # Personal score per product: similarity to the user's recent
+        # history, weighted by how strongly the user interacted with it.
+        with self._lock:
+            kinds = self._users.get(user)
+            if not kinds:
+                return {}
+            history = list(self._order.get(user, {}))[-self.history:]
+            row = {i: sum(self.weights.get(k, 0.0) for k in kinds[i]) for i in history}
+            neighbors = [(w, self._neighbors.get(i)) for i, w in row.items()]
+        out = {}
+        for w, nb in neighbors:
+            if nb is None:
+                continue
+            for j, s in zip(nb[0].tolist(), nb[1].tolist()):
+                out[j] = out.get(j, 0.0) + w * s
+        return {self.names[j]: s for j, s in out.items()}
+
+
+def blend(rule_recs, personal, weight, k=4, exclude=()):
+    # Mixes rule scores with personal scores, each scaled to [0, 1] by its
+    # best candidate. Candidates are the union of both lists; ties go to
+    # the rule order, then the name.
+    if not personal or weight <= 0:
+        return rule_recs[:k]
+    rule = dict(rule_recs)
+    top_rule = max(rule.values(), default=0.0) or 1.0
+    top_personal = max(personal.values()) or 1.0
+    rank = {name: pos for pos, (name, _) in enumerate(rule_recs)}
+    candidates = set(rule) | set(personal)
+    candidates.difference_update(exclude)
+    scored = [
+        ((1.0 - weight) * rule.get(p, 0.0) / top_rule + weight * personal.get(p, 0.0) / top_personal, p)
+        for p in candidates
+    ]
+    scored.sort(key=lambda t: (-t[0], rank.get(t[1], len(rank)), t[1]))
+    return [(p, s) for s, p in scored[:k]]
+
+
+def _rows_matrix(rows, n):
+    from scipy import sparse
+
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(r) for r in rows], out=indptr[1:])
+    indices = np.fromiter((i for r in rows for i in r), dtype=np.int32, count=int(indptr[-1]))
+    data = np.fromiter((v for r in rows for v in r.values()), dtype=np.float64, count=int(indptr[-1]))
+    return sparse.csr_matrix((data, indices, indptr), shape=(len(rows), n))
@@ -0,0 +1,165 @@
+from itertools import combinations
+
+import numpy as np
+
+import config
+
+METRICS = ("confidence", "lift", "leverage", "conviction")
+
+
+class Ranking:
+    # How rules are scored and thinned out before the recommendation index
+    # is built. The defaults (rank by confidence, keep everything) reproduce
+    # the original behaviour.
+    #
+    # rank_by: "confidence", "lift", "leverage", "conviction" or "blend"
+    #     (a weighted sum of min-max normalised metrics, see `weights`).
+    # top_k: keep only the k best rules per antecedent.
+    # prune: drop rules A -> C when some A' -> C with A' a proper subset of
+    #     A scores at least as well; the longer antecedent adds nothing.
+
+    def __init__(self, rank_by="confidence", weights=None, top_k=None, prune=False):
+        if rank_by not in METRICS + ("blend",):
+            raise ValueError(f"Unknown ranking metric: {rank_by!r} (choose from {METRICS + ('blend',)})")
+        weights = dict(weights or {"confidence": 0.5, "lift": 0.5})
+        unknown = set(weights) - set(METRICS)
+        if rank_by == "blend" and unknown:
+            raise ValueError(f"Unknown blend metrics: {sorted(unknown)} (choose from {METRICS})")
+        self.rank_by = rank_by
+        self.weights = weights
+        self.top_k = top_k
+        self.prune = prune
+
+    @classmethod
+    def from_config(cls):
+        return cls(config.RANK_BY, config.RANK_WEIGHTS, config.RULES_PER_ANTECEDENT, config.PRUNE_REDUNDANT)
+
+    @property
+    def is_default(self):
+        return self.rank_by == "confidence" and not self.top_k and not self.prune
+
+    def params(self):
+        # What goes into the artifact key.
+        return {
+            "rank_by": self.rank_by,
+            "weights": self.weights if self.rank_by == "blend" else None,
+            "top_k": self.top_k,
+            "prune": self.prune,
+        }
+
+    def apply(self, rules):
+        # Returns (rules, score column to build the index from). Kept rules
+        # stay in their original order, which is what breaks score ties.
+        if self.is_default:
+            return rules, "confidence"
+        score = rule_scores(rules, self.rank_by, self.weights)
+        keep = np.ones(len(rules), dtype=bool)
+        if self.prune:
+            keep &= ~redundant_rules(rules, score)
+        if self.top_k:
+            keep &= top_k_per_antecedent(rules, score, self.top_k, keep)
+        rules = rules[keep].reset_index(drop=True)
+        if self.rank_by == "confidence":
+            return rules, "confidence"
+        rules["score"] = score[keep]
+        return rules, "score"
+
+
+def rule_metrics(rules):
+    # Interestingness measures from the three support columns, so they do
+    # not depend on which columns a given mlxtend version emits.
+    a = rules["antecedent support"].to_numpy(dtype=np.float64)
+    c = rules["consequent support"].to_numpy(dtype=np.float64)
+    s = rules["support"].to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        confidence = s / a
+        lift = confidence / c
+        leverage = s - a * c
+        conviction = np.where(confidence >= 1.0, np.inf, (1.0 - c) / (1.0 - confidence))
+    return {"confidence": confidence, "lift": lift, "leverage": leverage, "conviction": conviction}
+
+
+def rule_scores(rules, rank_by="confidence", weights=None):
+    if rank_by == "confidence":
+        return rules["confidence"].to_numpy(dtype=np.float64)
+    metrics = rule_metrics(rules)
+    if rank_by != "blend":
+        return metrics[rank_by]
+    score = np.zeros(len(rules))
+    for name, w in (weights or {}).items():
+        score += w * _normalise(metrics[name])
+    return score
+
+
+def _normalise(x):
+    # Min-max to [0, 1]; infinite conviction (confidence 1) counts as the
+    # largest finite value.
+    finite = np.isfinite(x)
+    if not finite.any():
+        return np.ones_like(x)
+    lo, hi = x[finite].min(), x[finite].max()
+    x = np.where(finite, x, hi)
+    return (x - lo) / (hi - lo) if hi > lo else np.ones_like(x)
+
+
+def top_k_per_antecedent(rules, score, k, candidates=None):
+    # Mask of the k best-scoring rules in each antecedent group (among
+    # `candidates`), ties broken by rule order.
+    import pandas as pd
+
+    n = len(rules)
+    candidates = np.ones(n, dtype=bool) if candidates is None else candidates
+    groups = pd.factorize(rules["antecedents"])[0]
+    idx = np.flatnonzero(candidates)
+    order = idx[np.lexsort((idx, -score[idx], groups[idx]))]
+    g = groups[order]
+    first = np.flatnonzero(np.r_[True, g[1:] != g[:-1]]) if len(g) else np.zeros(0, dtype=np.int64)
+    rank = np.arange(len(order)) - np.repeat(first, np.diff(np.r_[first, len(order)]))
+    keep = np.zeros(n, dtype=bool)
+    keep[order[rank < k]] = True
+    return keep
+
+
+def redundant_rules(rules, score):
+    # Mask of rules A -> C for which a more general rule A' -> C (A' a proper,
+    # non-empty subset of A) scores at least as well. Antecedents become rows
+    # of sorted item ids; every subset pattern of each antecedent length is
+    # taken as a column slice, and all subsets are matched against the rules
+    # with one merge. Python only loops over the 2^len patterns, not rules.
+    import pandas as pd
+
+    n = len(rules)
+    redundant = np.zeros(n, dtype=bool)
+    sizes = rules["antecedents"].map(len).to_numpy(dtype=np.int64)
+    if n == 0 or sizes.max() < 2:
+        return redundant
+
+    items = pd.factorize(np.fromiter((p for a in rules["antecedents"] for p in a), dtype=object))[0]
+    width, pad = int(sizes.max()), int(items.max()) + 1
+    ants = np.full((n, width), pad, dtype=np.int64)
+    starts = np.cumsum(sizes) - sizes
+    ants[np.repeat(np.arange(n), sizes), np.arange(len(items)) - np.repeat(starts, sizes)] = items
+    ants.sort(axis=1)
+    cons = pd.factorize(rules["consequents"])[0]
+
+    cols = [f"a{j}" for j in range(width)]
+    known = pd.DataFrame(ants, columns=cols)
+    known["c"], known["general"] = cons, score
+    queries = []
+    for length in range(2, width + 1):
+        rows = np.flatnonzero(sizes == length)
+        if not len(rows):
+            continue
+        for r in range(1, length):
+            for pattern in combinations(range(length), r):
+                sub = np.full((len(rows), width), pad, dtype=np.int64)
+                sub[:, :r] = ants[rows][:, pattern]
+                query = pd.DataFrame(sub, columns=cols)
+                query["c"], query["rule"] = cons[rows], rows
+                queries.append(query)
+    if not queries:
+        return redundant
+    found = pd.concat(queries, ignore_index=True).merge(known, on=cols + ["c"])
+    general = np.full(n, -np.inf)
+    np.maximum.at(general, found["rule"].to_numpy(), found["general"].to_numpy(dtype=np.float64))
+    return general >= score
@@ -0,0 +1,325 @@
+import numpy as np
+
+
+class RecIndex:
+    # Inverted recommendation index in CSR form. Row i lists every product that
+    # shares a rule with product i, already ranked the way recommend() ranks
+    # them: best confidence first, ties in the order the rules produced them.
+    # `confidences` and `lifts` hold the confidence and lift of the rule that
+    # supplied each entry's score.
+
+    def __init__(self, names, offsets, targets, scores, lifts=None, confidences=None):
+        self.names = list(names)
+        self.ids = {n: i for i, n in enumerate(self.names)}
+        self.offsets = offsets
+        self.targets = targets
+        self.scores = scores
+        self.lifts = np.full(len(targets), np.nan) if lifts is None else lifts
+        self.confidences = np.full(len(targets), np.nan) if confidences is None else confidences
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self):
+        return sum(np.asarray(a).nbytes for a in (self.offsets, self.targets, self.scores, self.confidences, self.lifts))
+
+    def lookup(self, product, k=4):
+        i = self.ids.get(product)
+        if i is None:
+            return []
+        lo = int(self.offsets[i])
+        hi = min(int(self.offsets[i + 1]), lo + k)
+        return [
+            (self.names[t], float(s))
+            for t, s in zip(self.targets[lo:hi], self.scores[lo:hi])
+        ]
+
+    def lookup_many(self, products, k=4):
+        # Vectorised lookup for many products at once. Returns flat arrays
+        # (query position, target id, score, confidence, lift), up to k per
+        # query.
+        ids = np.array([self.ids.get(p, -1) for p in products], dtype=np.int64)
+        known = np.flatnonzero(ids >= 0)
+        offsets = np.asarray(self.offsets)
+        lo = offsets[ids[known]]
+        lengths = np.minimum(offsets[ids[known] + 1] - lo, k)
+        first = np.cumsum(lengths) - lengths
+        positions = np.repeat(lo - first, lengths) + np.arange(int(lengths.sum()))
+        return (
+            np.repeat(known, lengths), np.asarray(self.targets)[positions],
+            np.asarray(self.scores)[positions], np.asarray(self.confidences)[positions],
+            np.asarray(self.lifts)[positions],
+        )
+
+    def replace_rows(self, partial, products):
+        # Returns a new index whose rows for `products` come from `partial`
+        # (an index built over just those products) and whose other rows are
+        # copied from this one. Products first seen in `partial` are appended.
+        names = self.names + [p for p in partial.names if p not in self.ids]
+        ids = {p: i for i, p in enumerate(names)}
+        n, n_old = len(names), len(self.names)
+        remap = np.array([ids[p] for p in partial.names], dtype=np.int32)
+
+        old_len = np.zeros(n, dtype=np.int64)
+        old_start = np.zeros(n, dtype=np.int64)
+        old_len[:n_old] = np.diff(self.offsets)
+        old_start[:n_old] = self.offsets[:-1]
+        new_len = np.zeros(n, dtype=np.int64)
+        new_start = np.zeros(n, dtype=np.int64)
+        new_len[remap] = np.diff(partial.offsets)
+        new_start[remap] = np.asarray(partial.offsets[:-1]) + len(self.targets)
+
+        take = np.zeros(n, dtype=bool)
+        take[[ids[p] for p in products if p in ids]] = True
+        lengths = np.where(take, new_len, old_len)
+        starts = np.where(take, new_start, old_start)
+
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        targets = np.concatenate([self.targets, remap[partial.targets]])[gather]
+        scores = np.concatenate([self.scores, partial.scores])[gather]
+        confidences = np.concatenate([self.confidences, partial.confidences])[gather]
+        lifts = np.concatenate([self.lifts, partial.lifts])[gather]
+        return RecIndex(names, offsets, targets, scores, lifts, confidences)
+
+
+class ShardedIndex:
+    # One RecIndex per rule shard (see sharding.py) behind the RecIndex
+    # lookup API. A product is routed to the shards holding a row for it,
+    # normally its own category's shard and the cross-category shard(s), so
+    # a lookup never reads another category's rules. Rows from several
+    # shards are merged best score first, ties going to the earlier shard.
+
+    def __init__(self, shard_names, shards):
+        self.shard_names = list(shard_names)
+        self.shards = list(shards)
+        self.names = sorted({p for shard in self.shards for p in shard.names})
+        self.ids = {n: i for i, n in enumerate(self.names)}
+        self.routes = {}
+        for s, shard in enumerate(self.shards):
+            for p in shard.names:
+                self.routes.setdefault(p, []).append(s)
+        # Shard-local product id -> global id.
+        self._remap = [np.array([self.ids[p] for p in shard.names], dtype=np.int32) for shard in self.shards]
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self):
+        return sum(shard.nbytes for shard in self.shards)
+
+    def shard(self, name):
+        return self.shards[self.shard_names.index(name)]
+
+    def lookup(self, product, k=4):
+        routes = self.routes.get(product, ())
+        if len(routes) == 1:
+            return self.shards[routes[0]].lookup(product, k)
+        rows = [self.shards[s].lookup(product, k) for s in routes]
+        merged = sorted((item for row in rows for item in row), key=lambda item: -item[1])
+        out, seen = [], set()
+        for name, score in merged:
+            if name not in seen:
+                seen.add(name)
+                out.append((name, score))
+                if len(out) == k:
+                    break
+        return out
+
+    def lookup_many(self, products, k=4):
+        # Same flat arrays as RecIndex.lookup_many, target ids in this
+        # index's product order.
+        parts = []
+        for s, shard in enumerate(self.shards):
+            q, targets, scores, conf, lifts = shard.lookup_many(products, k)
+            parts.append((q, self._remap[s][targets], scores, conf, lifts, np.full(len(q), s)))
+        if not parts:
+            empty = np.zeros(0)
+            return empty.astype(np.int64), empty.astype(np.int32), empty, empty, empty
+        q, targets, scores, conf, lifts, shard = (np.concatenate(cols) for cols in zip(*parts))
+        seq = np.arange(len(q))
+        order = np.lexsort((seq, shard, -scores, q))
+        q, targets, scores, conf, lifts = q[order], targets[order], scores[order], conf[order], lifts[order]
+        # A target reachable through two shards keeps its best entry.
+        pair = q.astype(np.int64) * max(len(self.names), 1) + targets
+        _, first = np.unique(pair, return_index=True)
+        keep = np.zeros(len(q), dtype=bool)
+        keep[first] = True
+        q, targets, scores, conf, lifts = q[keep], targets[keep], scores[keep], conf[keep], lifts[keep]
+        starts = np.r_[0, np.flatnonzero(q[1:] != q[:-1]) + 1] if len(q) else np.zeros(0, dtype=np.int64)
+        rank = np.arange(len(q)) - np.repeat(starts, np.diff(np.r_[starts, len(q)]))
+        top = rank < k
+        return q[top], targets[top], scores[top], conf[top], lifts[top]
+
+
+def build_rec_index(rules, score_col="confidence", products=None):
+    # With `products`, only the rows for those products are filled in (see
+    # RecIndex.replace_rows).
+    names = sorted({p for col in ("antecedents", "consequents") for s in rules[col] for p in s})
+    ids = {n: i for i, n in enumerate(names)}
+    keep = None if products is None else {ids[p] for p in products if p in ids}
+
+    # One (product, target) pair per item combination of every rule, in the
+    # same order the old per-click scan visited them. The position of a pair
+    # in these arrays is what breaks confidence ties.
+    src, dst, score, conf, lift = [], [], [], [], []
+    conf_col = rules["confidence"] if "confidence" in rules.columns else [np.nan] * len(rules)
+    lift_col = rules["lift"] if "lift" in rules.columns else [np.nan] * len(rules)
+    for ants, cons, s, f, l in zip(rules["antecedents"], rules["consequents"], rules[score_col], conf_col, lift_col):
+        a = [ids[p] for p in ants]
+        c = [ids[p] for p in cons]
+        for p in a:
+            if keep is not None and p not in keep:
+                continue
+            src.extend([p] * len(c))
+            dst.extend(c)
+            score.extend([s] * len(c))
+            conf.extend([f] * len(c))
+            lift.extend([l] * len(c))
+        for p in c:
+            if keep is not None and p not in keep:
+                continue
+            src.extend([p] * len(a))
+            dst.extend(a)
+            score.extend([s] * len(a))
+            conf.extend([f] * len(a))
+            lift.extend([l] * len(a))
+
+    src = np.asarray(src, dtype=np.int32)
+    dst = np.asarray(dst, dtype=np.int32)
+    score = np.asarray(score, dtype=np.float64)
+    conf = np.asarray(conf, dtype=np.float64)
+    lift = np.asarray(lift, dtype=np.float64)
+    seq = np.arange(len(src))
+
+    if len(src):
+        # Collapse duplicate (product, target) pairs: keep the best score
+        # (with its rule's confidence and lift) and the position where the target was first
+        # seen for that product.
+        order = np.lexsort((seq, -score, dst, src))
+        src, dst, score, conf, lift, seq = (a[order] for a in (src, dst, score, conf, lift, seq))
+        starts = np.flatnonzero(np.r_[True, (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])])
+        first_seen = np.minimum.reduceat(seq, starts)
+        src, dst, score, conf, lift = (a[starts] for a in (src, dst, score, conf, lift))
+        seq = first_seen
+
+        order = np.lexsort((seq, -score, src))
+        src, dst, score, conf, lift = (a[order] for a in (src, dst, score, conf, lift))
+
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=len(names)), out=offsets[1:])
+    return RecIndex(names, offsets, dst, score, lift, conf)
+
+
+class BasketScorer:
+    # Rules as two sparse incidence matrices (rules x products): which
+    # products make up each antecedent and each consequent. A basket matches
+    # a rule when its overlap with the antecedent equals the antecedent's
+    # size, so scoring baskets is one sparse product plus a grouped reduce.
+    # Aggregates: "max" keeps the best confidence per product, "sum" adds
+    # up confidences and "lift" adds up confidence x lift.
+
+    AGGREGATES = ("max", "sum", "lift")
+
+    def __init__(self, names, antecedents, consequents, confidence, lift):
+        self.names = list(names)
+        self.ids = {n: i for i, n in enumerate(self.names)}
+        self.antecedents = antecedents
+        self.consequents = consequents
+        self.ant_len = np.diff(antecedents.indptr)
+        self._antecedents_t = antecedents.T.tocsr()
+        self.confidence = np.asarray(confidence, dtype=np.float64)
+        self.lift = np.asarray(lift, dtype=np.float64)
+
+    @classmethod
+    def from_csr(cls, names, ant_offsets, ant_items, cons_offsets, cons_items, confidence, lift):
+        # scipy is only loaded once basket scoring is first used.
+        from scipy import sparse
+
+        shape = (len(ant_offsets) - 1, len(names))
+        ants = sparse.csr_matrix((np.ones(len(ant_items), dtype=np.float32), ant_items, ant_offsets), shape=shape)
+        cons = sparse.csr_matrix((np.ones(len(cons_items), dtype=np.float32), cons_items, cons_offsets), shape=shape)
+        return cls(names, ants, cons, confidence, lift)
+
+    def recommend(self, basket, k=4, agg="max"):
+        from scipy import sparse
+
+        ids = sorted({self.ids[p] for p in basket if p in self.ids})
+        matrix = sparse.csr_matrix(
+            (np.ones(len(ids), dtype=np.float32), ids, [0, len(ids)]), shape=(1, len(self.names)),
+        )
+        _, items, scores, _, _ = self.recommend_many(matrix, k, agg)
+        return [(self.names[i], float(s)) for i, s in zip(items, scores)]
+
+    def recommend_many(self, baskets, k=4, agg="max"):
+        # Scores many baskets at once. `baskets` is a CSR matrix (baskets x
+        # products, in this scorer's product order). Returns flat arrays
+        # (row, product id, score, best confidence, best lift) holding up to
+        # k entries per basket, best first with ties by product name.
+        if agg not in self.AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {agg!r} (choose from {self.AGGREGATES})")
+        n_items = len(self.names)
+        hits = (baskets.astype(np.float32) @ self._antecedents_t).tocoo()
+        ok = hits.data == self.ant_len[hits.col]
+        rows, rules = hits.row[ok], hits.col[ok]
+        # One entry per (matched rule, consequent product).
+        rep, positions = _gather_rows(self.consequents, rules)
+        rows, rules, items = rows[rep], rules[rep], self.consequents.indices[positions]
+
+        key = rows.astype(np.int64) * n_items + items
+        conf, lift = self.confidence[rules], self.lift[rules]
+        w = conf * lift if agg == "lift" else conf
+
+        order = np.argsort(key, kind="stable")
+        key, conf, lift, w = key[order], conf[order], lift[order], w[order]
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]]) if len(key) else np.zeros(0, dtype=np.int64)
+        key = key[starts]
+        if len(starts):
+            score = np.maximum.reduceat(w, starts) if agg == "max" else np.add.reduceat(w, starts)
+            conf = np.maximum.reduceat(conf, starts)
+            lift = np.maximum.reduceat(lift, starts)
+        else:
+            score = conf = lift = np.zeros(0)
+
+        # Drop products the basket already holds.
+        held = baskets.tocoo()
+        keep = ~np.isin(key, held.row.astype(np.int64) * n_items + held.col)
+        key, score, conf, lift = key[keep], score[keep], conf[keep], lift[keep]
+
+        rows, items = key // n_items, key % n_items
+        order = np.lexsort((items, -score, rows))
+        rows, items, score, conf, lift = rows[order], items[order], score[order], conf[order], lift[order]
+        first = np.r_[0, np.flatnonzero(rows[1:] != rows[:-1]) + 1] if len(rows) else np.zeros(0, dtype=np.int64)
+        rank = np.arange(len(rows)) - np.repeat(first, np.diff(np.r_[first, len(rows)]))
+        top = rank < k
+        return rows[top], items[top], score[top], conf[top], lift[top]
+
+
+def _gather_rows(csr, pick):
+    # Positions of every stored entry in the picked CSR rows, plus which
+    # pick each entry came from.
+    lengths = np.diff(csr.indptr)[pick]
+    first = np.cumsum(lengths) - lengths
+    positions = np.repeat(csr.indptr[pick] - first, lengths) + np.arange(int(lengths.sum()))
+    return np.repeat(np.arange(len(pick)), lengths), positions
+
+
+def build_basket_scorer(rules, names=None):
+    names = names or sorted({p for col in ("antecedents", "consequents") for s in rules[col] for p in s})
+    ids = {n: i for i, n in enumerate(names)}
+
+    def encode(sets):
+        offsets = np.zeros(len(sets) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in sets], out=offsets[1:])
+        flat = np.fromiter((ids[p] for s in sets for p in s), dtype=np.int32, count=int(offsets[-1]))
+        return offsets, flat
+
+    ant_offsets, ant_items = encode(list(rules["antecedents"]))
+    cons_offsets, cons_items = encode(list(rules["consequents"]))
+    return BasketScorer.from_csr(
+        names, ant_offsets, ant_items, cons_offsets, cons_items,
+        rules["confidence"].to_numpy(), rules["lift"].to_numpy(),
+    )
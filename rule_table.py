@@ -0,0 +1,148 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+SET_COLUMNS = ("antecedents", "consequents")
+EXACT_COLUMNS = ("confidence", "lift")  # stay float64: BasketScorer ranks carts on them
+
+
+class RuleTable:
+    # Association rules in flat arrays instead of a DataFrame of frozensets.
+    #
+    #   names             one interned string per product; rules refer to
+    #                     products by position in this table
+    #   ant_offsets/items antecedent of rule i is
+    #                     ant_items[ant_offsets[i]:ant_offsets[i + 1]] (CSR)
+    #   cons_offsets/items the same for the consequents
+    #   metrics           one column per association_rules() metric: float32,
+    #                     except EXACT_COLUMNS, which stay float64 so basket
+    #                     scores match the DataFrame bit for bit
+    #
+    # Roughly 4 bytes per metric (8 for the exact ones) plus 4 per item and
+    # 16 of offsets per rule, against several hundred for the DataFrame. Saved as plain .npy
+    # files, so load() memory-maps them: worker processes opening the same
+    # directory share the pages instead of holding copies.
+
+    def __init__(self, names, ant_offsets, ant_items, cons_offsets, cons_items, metrics):
+        self.names = [sys.intern(n) for n in names]
+        self.ant_offsets = ant_offsets
+        self.ant_items = ant_items
+        self.cons_offsets = cons_offsets
+        self.cons_items = cons_items
+        self.metrics = dict(metrics)
+
+    @classmethod
+    def from_rules(cls, rules, names=None, dtype=np.float32):
+        # Converts association_rules() output (or any frame with frozenset
+        # antecedents/consequents and numeric metric columns). `names`
+        # fixes the product table; by default it is every product used,
+        # sorted. `dtype` applies to every metric outside EXACT_COLUMNS.
+        if names is None:
+            names = sorted({p for col in SET_COLUMNS for s in rules[col] for p in s})
+        ids = {n: i for i, n in enumerate(names)}
+        ant_offsets, ant_items = encode_sets(rules["antecedents"], ids)
+        cons_offsets, cons_items = encode_sets(rules["consequents"], ids)
+        metrics = {
+            col: rules[col].to_numpy(dtype=np.float64 if col in EXACT_COLUMNS else dtype)
+            for col in rules.columns if col not in SET_COLUMNS
+        }
+        return cls(names, ant_offsets, ant_items, cons_offsets, cons_items, metrics)
+
+    def __len__(self):
+        return len(self.ant_offsets) - 1
+
+    @property
+    def columns(self):
+        return list(self.metrics)
+
+    @property
+    def nbytes(self):
+        arrays = [self.ant_offsets, self.ant_items, self.cons_offsets, self.cons_items, *self.metrics.values()]
+        return sum(np.asarray(a).nbytes for a in arrays) + sum(len(n.encode("utf-8")) for n in self.names)
+
+    def column(self, name):
+        return self.metrics[name]
+
+    def antecedent(self, i):
+        return [self.names[j] for j in self.ant_items[self.ant_offsets[i]:self.ant_offsets[i + 1]]]
+
+    def consequent(self, i):
+        return [self.names[j] for j in self.cons_items[self.cons_offsets[i]:self.cons_offsets[i + 1]]]
+
+    def to_frame(self):
+        # The association_rules() layout, for code that wants a DataFrame.
+        # Metrics come back as float64 (the float32 ones holding the stored
+        # values).
+        import pandas as pd
+
+        frame = pd.DataFrame({
+            "antecedents": decode_sets(self.names, self.ant_offsets, self.ant_items),
+            "consequents": decode_sets(self.names, self.cons_offsets, self.cons_items),
+        })
+        for col, values in self.metrics.items():
+            frame[col] = np.asarray(values, dtype=np.float64)
+        return frame
+
+    def save(self, path, prefix="rules"):
+        # Writes <prefix>_*.npy files plus <prefix>.json into `path`.
+        os.makedirs(path, exist_ok=True)
+        blob, name_offsets = _pack_names(self.names)
+        arrays = {
+            "names": blob, "name_offsets": name_offsets,
+            "ant_offsets": self.ant_offsets, "ant_items": self.ant_items,
+            "cons_offsets": self.cons_offsets, "cons_items": self.cons_items,
+        }
+        for i, values in enumerate(self.metrics.values()):
+            arrays[f"metric{i}"] = values
+        for name, arr in arrays.items():
+            np.save(os.path.join(path, f"{prefix}_{name}.npy"), np.ascontiguousarray(arr))
+        with open(os.path.join(path, prefix + ".json"), "w", encoding="utf-8") as f:
+            json.dump({"rules": len(self), "metrics": list(self.metrics)}, f)
+
+    @classmethod
+    def load(cls, path, prefix="rules", mmap=True):
+        mode = "r" if mmap else None
+        with open(os.path.join(path, prefix + ".json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        def array(name):
+            return np.load(os.path.join(path, f"{prefix}_{name}.npy"), mmap_mode=mode)
+
+        names = _unpack_names(array("names"), array("name_offsets"))
+        metrics = {col: array(f"metric{i}") for i, col in enumerate(meta["metrics"])}
+        return cls(
+            names, array("ant_offsets"), array("ant_items"), array("cons_offsets"), array("cons_items"), metrics,
+        )
+
+
+def encode_sets(sets, ids):
+    # Frozensets as CSR: offsets plus the sorted product ids of each set.
+    # model_store uses the same layout for the frequent itemsets.
+    sizes = np.fromiter((len(s) for s in sets), dtype=np.int64, count=len(sets))
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    flat = np.fromiter((ids[p] for s in sets for p in sorted(s)), dtype=np.int32, count=int(offsets[-1]))
+    return offsets, flat
+
+
+def decode_sets(names, offsets, flat):
+    offsets = np.asarray(offsets).tolist()
+    flat = np.asarray(flat).tolist()
+    return [frozenset(names[j] for j in flat[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+
+
+def _pack_names(names):
+    # The string table as one UTF-8 blob plus offsets, so it maps like the
+    # other arrays.
+    encoded = [n.encode("utf-8") for n in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_names(blob, offsets):
+    data = np.asarray(blob).tobytes()
+    offsets = np.asarray(offsets).tolist()
+    return [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
@@ -0,0 +1,235 @@
+import argparse
+import math
+import time
+from itertools import combinations
+from statistics import NormalDist
+
+import numpy as np
+
+import config
+from loader import Baskets, encode_baskets, load_baskets, sample_baskets
+
+
+class SampledMiner:
+    # Mines a uniform sample of the baskets to preview what a full run would
+    # produce, for tuning min_support / min_threshold (Toivonen, 1996).
+    #
+    # Itemsets are mined on the sample at a lowered threshold: by a
+    # Chernoff bound, an itemset whose true support is min_support shows
+    # up below the lowered value with probability at most `delta`. Every
+    # support and confidence carries a two-sided (1 - delta) Wilson
+    # interval, with a finite-population correction, so a sample that
+    # covers the whole file has zero-width bounds.
+    #
+    # With verify=True, every sampled candidate and the candidates'
+    # negative border are counted exactly on the full baskets. The border
+    # is the set of itemsets that just missed the lowered threshold. The
+    # result is then the exact frequent itemsets and rules. The only thing
+    # that can be missed is a superset of a border itemset that turned out
+    # frequent. report["border_frequent"] counts those border itemsets; a
+    # non-zero value means "re-run with a bigger sample".
+    #
+    # One SampledMiner can be mined at many thresholds without re-reading
+    # the file.
+
+    def __init__(self, sample, total, delta=config.SAMPLE_DELTA, full=None, path=None):
+        self.sample = sample  # Baskets
+        self.total = total    # baskets in the full data
+        self.delta = delta
+        self._full = full
+        self._path = path
+        self.z = NormalDist().inv_cdf(1.0 - delta / 2.0)
+
+    @classmethod
+    def from_file(cls, path, size=config.SAMPLE_SIZE, seed=None, delta=config.SAMPLE_DELTA):
+        baskets, total = sample_baskets(path, size, seed)
+        return cls(encode_baskets(baskets), total, delta, path=path)
+
+    @classmethod
+    def from_baskets(cls, baskets, size=config.SAMPLE_SIZE, seed=None, delta=config.SAMPLE_DELTA):
+        n = len(baskets)
+        rows = np.sort(np.random.default_rng(seed).choice(n, size=min(size, n), replace=False))
+        return cls(Baskets(baskets.matrix[rows], baskets.items), n, delta, full=baskets)
+
+    def __len__(self):
+        return len(self.sample)
+
+    def lowered_support(self, min_support):
+        m = len(self.sample)
+        if not m:
+            return min_support
+        eta = math.sqrt(2.0 * math.log(1.0 / self.delta) / (m * min_support))
+        return max(min_support * (1.0 - eta), 1.0 / m)
+
+    def full_baskets(self):
+        # Loaded on first verification only.
+        if self._full is None:
+            self._full = load_baskets(self._path)
+        return self._full
+
+    def mine(self, min_support, min_threshold, miner="auto", max_len=None, verify=config.SAMPLE_VERIFY):
+        # Returns (freq_items, rules, report). Rules carry support_low /
+        # support_high and confidence_low / confidence_high columns.
+        from mlxtend.frequent_patterns import association_rules
+
+        from mining import mine_frequent_itemsets
+
+        start = time.perf_counter()
+        m = len(self.sample)
+        low = self.lowered_support(min_support)
+        candidates = mine_frequent_itemsets(self.sample, low, algorithm=miner, max_len=max_len)
+        report = {
+            "sample": m, "baskets": self.total, "min_support": min_support,
+            "lowered_support": low, "candidates": len(candidates), "delta": self.delta,
+        }
+        if verify:
+            freq_items, border = self._verify(candidates, min_support, max_len)
+            report["negative_border"] = len(border)
+            report["border_frequent"] = int((border >= min_support).sum())
+            scale = self.total
+        else:
+            freq_items = candidates[candidates["support"] >= min_support].reset_index(drop=True)
+            scale = m
+        if len(freq_items):
+            rules = association_rules(freq_items, metric="confidence", min_threshold=min_threshold)
+        else:
+            rules = _empty_rules()
+        rules["support_low"], rules["support_high"] = self.interval(rules["support"], scale, verify)
+        # Confidence is a proportion of the baskets holding the antecedent.
+        ant = np.rint(rules["antecedent support"].to_numpy() * scale)
+        rules["confidence_low"], rules["confidence_high"] = self.interval(rules["confidence"], ant, verify)
+        report.update({"itemsets": len(freq_items), "rules": len(rules), "seconds": time.perf_counter() - start})
+        return freq_items, rules, report
+
+    def interval(self, p, trials, exact=False):
+        # Wilson score interval for proportions p observed over `trials`
+        # sampled baskets, scaled by the finite-population correction.
+        p = np.asarray(p, dtype=np.float64)
+        if exact:
+            return p.copy(), p.copy()
+        trials = np.maximum(np.broadcast_to(np.asarray(trials, dtype=np.float64), p.shape), 1.0)
+        m, n = len(self.sample), self.total
+        fpc = math.sqrt((n - m) / (n - 1)) if n > 1 and m < n else 0.0
+        z = self.z
+        centre = (p + z * z / (2 * trials)) / (1 + z * z / trials)
+        half = z * np.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / (1 + z * z / trials)
+        centre = p + (centre - p) * fpc
+        half = half * fpc
+        return np.clip(centre - half, 0.0, 1.0), np.clip(centre + half, 0.0, 1.0)
+
+    def _verify(self, candidates, min_support, max_len):
+        # Exact supports for the candidates and their negative border.
+        # Returns (frequent itemsets, border supports).
+        import pandas as pd
+
+        from mining import canonical_order
+
+        full = self.full_baskets()
+        ids = {p: i for i, p in enumerate(full.items)}
+        n = len(full)
+        found = {tuple(sorted(ids[p] for p in s)) for s in candidates["itemsets"] if all(p in ids for p in s)}
+        border = _negative_border(found, len(full.items), max_len)
+        sets = sorted(found) + border
+        counts = _count_exact(full.matrix, sets)
+        support = counts / n if n else np.zeros(len(sets))
+        # Frequent border itemsets are kept too: their subsets are all
+        # candidates, so they are exact, only their supersets are unknown.
+        keep = support >= min_support
+        freq_items = pd.DataFrame({
+            "support": support[keep],
+            "itemsets": [frozenset(full.items[j] for j in s) for s, k in zip(sets, keep) if k],
+        })
+        return canonical_order(freq_items), support[len(found):]
+
+
+def _count_exact(matrix, sets):
+    # Basket counts for sorted id tuples. The border is mostly singletons
+    # and pairs: those come from column sums and one sparse X^T X, and only
+    # longer itemsets go through bitset intersections.
+    from mining import count_itemsets
+
+    counts = np.zeros(len(sets), dtype=np.int64)
+    size = np.array([len(s) for s in sets], dtype=np.int64)
+    single = np.flatnonzero(size == 1)
+    if len(single):
+        col_counts = np.asarray(matrix.sum(axis=0)).ravel()
+        counts[single] = col_counts[[sets[i][0] for i in single]]
+    pair = np.flatnonzero(size == 2)
+    if len(pair):
+        cols = sorted({j for i in pair for j in sets[i]})
+        pos = {j: i for i, j in enumerate(cols)}
+        x = matrix[:, cols].astype(np.int32)
+        co = (x.T @ x).tocsr()
+        a = [pos[sets[i][0]] for i in pair]
+        b = [pos[sets[i][1]] for i in pair]
+        counts[pair] = np.asarray(co[a, b]).ravel()
+    longer = np.flatnonzero(size > 2)
+    if len(longer):
+        counts[longer] = count_itemsets(matrix, [sets[i] for i in longer])
+    return counts
+
+
+def _negative_border(found, n_items, max_len=None):
+    # Itemsets outside `found` all of whose immediate subsets are in it
+    # (singletons: every item not in it). Itemsets are sorted id tuples.
+    border = [(j,) for j in range(n_items) if (j,) not in found]
+    by_size = {}
+    for s in found:
+        by_size.setdefault(len(s), []).append(s)
+    for k, level in sorted(by_size.items()):
+        if max_len and k + 1 > max_len:
+            break
+        # Apriori join: two k-itemsets sharing their first k - 1 items.
+        prefixes = {}
+        for s in sorted(level):
+            prefixes.setdefault(s[:-1], []).append(s[-1])
+        for prefix, tails in prefixes.items():
+            for a, b in combinations(tails, 2):
+                cand = prefix + (a, b)
+                if cand in found:
+                    continue
+                if all(cand[:i] + cand[i + 1:] in found for i in range(len(cand))):
+                    border.append(cand)
+    return border
+
+
+def _empty_rules():
+    import pandas as pd
+
+    return pd.DataFrame({
+        "antecedents": [], "consequents": [],
+        "antecedent support": np.zeros(0), "consequent support": np.zeros(0),
+        "support": np.zeros(0), "confidence": np.zeros(0), "lift": np.zeros(0),
+    })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preview mining results on a sample of the transactions.")
+    parser.add_argument("transactions", nargs="?", default=config.TRANSACTIONS_PATH)
+    parser.add_argument("--sample", type=int, default=config.SAMPLE_SIZE, help="baskets drawn (reservoir sampling)")
+    parser.add_argument("--min-support", type=float, nargs="+", default=[config.MIN_SUPPORT])
+    parser.add_argument("--min-threshold", type=float, default=config.MIN_THRESHOLD)
+    parser.add_argument("--max-len", type=int, default=config.MAX_LEN)
+    parser.add_argument("--miner", default=config.MINER)
+    parser.add_argument("--delta", type=float, default=config.SAMPLE_DELTA, help="1 - confidence level of the bounds")
+    parser.add_argument("--verify", action="store_true", default=config.SAMPLE_VERIFY,
+                        help="count the sampled itemsets exactly on the full data")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    sampler = SampledMiner.from_file(args.transactions, args.sample, args.seed, args.delta)
+    print(f"sampled {len(sampler)} of {sampler.total} baskets in {time.perf_counter() - start:.2f}s")
+    print(f"{'min_support':>11} {'lowered':>9} {'itemsets':>9} {'rules':>7} {'±support':>9} {'±confidence':>12} "
+          f"{'border hits':>12} {'seconds':>8}")
+    for min_support in args.min_support:
+        _, rules, r = sampler.mine(min_support, args.min_threshold, args.miner, args.max_len, args.verify)
+        sup = float(np.median(rules["support_high"] - rules["support_low"])) / 2 if len(rules) else 0.0
+        conf = float(np.median(rules["confidence_high"] - rules["confidence_low"])) / 2 if len(rules) else 0.0
+        hits = r.get("border_frequent", "-")
+        print(f"{min_support:>11g} {r['lowered_support']:>9.5f} {r['itemsets']:>9} {r['rules']:>7} {sup:>9.5f} "
+              f"{conf:>12.4f} {hits:>12} {r['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+
+# Per-user product lists. "recent" keeps every view (duplicates included),
+# the others hold each product once.
+LIST_KINDS = ("liked", "cart", "recent")
+UNIQUE_KINDS = ("liked", "cart")
+
+# Passwords are only ever kept as salted scrypt hashes,
+# "scrypt$<salt hex>$<hash hex>", in memory and on disk alike.
+SCRYPT_PARAMS = {"n": 2 ** 14, "r": 8, "p": 1}
+
+
+def hash_password(password):
+    salt = os.urandom(16)
+    digest = hashlib.scrypt(password.encode("utf-8"), salt=salt, **SCRYPT_PARAMS)
+    return f"scrypt${salt.hex()}${digest.hex()}"
+
+
+def verify_password(stored, password):
+    scheme, _, rest = (stored or "").partition("$")
+    salt, _, digest = rest.partition("$")
+    if scheme != "scrypt" or not salt:
+        return False
+    candidate = hashlib.scrypt(password.encode("utf-8"), salt=bytes.fromhex(salt), **SCRYPT_PARAMS)
+    return hmac.compare_digest(candidate.hex(), digest)
+
+
+def hash_plaintext_passwords(conn):
+    # Rewrites password rows left in plain text by older versions.
+    rows = conn.execute("SELECT username, password FROM users WHERE password NOT LIKE 'scrypt$%'").fetchall()
+    if rows:
+        conn.executemany("UPDATE users SET password = ? WHERE username = ?", [(hash_password(p), u) for u, p in rows])
+
+
+class MemoryStore:
+    # In-process store guarded by one lock. Safe with any number of Gradio
+    # worker threads, but not shared between processes. With a `journal`
+    # (persistence.StateJournal), every change is also queued for disk.
+
+    def __init__(self, journal=None):
+        self._lock = threading.RLock()
+        self._users = {}
+        self._lists = {}
+        self.journal = journal
+
+    def set_user(self, username, password):
+        # Creates the user, or resets an existing one (what Sign Up did).
+        self.restore_user(username, hash_password(password))
+
+    def restore_user(self, username, password_hash):
+        # set_user() for a password that is already hashed (a replayed journal).
+        with self._lock:
+            self._users[username] = password_hash
+            self._lists[username] = {kind: [] for kind in LIST_KINDS}
+            if self.journal is not None:
+                self.journal.add_user(username, password_hash)
+
+    def users(self):
+        with self._lock:
+            return list(self._users)
+
+    def has_user(self, username):
+        with self._lock:
+            return username in self._users
+
+    def check_password(self, username, password):
+        with self._lock:
+            stored = self._users.get(username)
+        if not verify_password(stored, password):
+            return False
+        with self._lock:
+            self._lists.setdefault(username, {kind: [] for kind in LIST_KINDS})
+        return True
+
+    def get_list(self, username, kind):
+        with self._lock:
+            return list(self._lists.get(username, {}).get(kind, []))
+
+    def count(self, username, kind):
+        with self._lock:
+            return len(self._lists.get(username, {}).get(kind, []))
+
+    def add_item(self, username, kind, product):
+        # Returns True when the product was added (False for a repeat in a
+        # unique list, an unknown user or an empty product).
+        if not product:
+            return False
+        with self._lock:
+            lists = self._lists.get(username)
+            if lists is None:
+                return False
+            items = lists[kind]
+            if kind in UNIQUE_KINDS and product in items:
+                return False
+            items.append(product)
+            if self.journal is not None:
+                self.journal.add_item(username, kind, product)
+            return True
+
+
+class SQLiteStore:
+    # Store backed by one SQLite file in WAL mode, so several app processes
+    # on the same host can share users and lists. Each thread gets its own
+    # connection. Writes run in IMMEDIATE transactions; reads are single
+    # autocommit statements on a WAL snapshot, so they never take the
+    # write lock or wait for a writer.
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                password TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                product TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS items_user_kind ON items (username, kind, product);
+        """)
+        with self._write() as conn:
+            hash_plaintext_passwords(conn)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self):
+        return _Transaction(self._conn())
+
+    def set_user(self, username, password):
+        password_hash = hash_password(password)
+        with self._write() as conn:
+            conn.execute("INSERT OR REPLACE INTO users VALUES (?, ?)", (username, password_hash))
+            conn.execute("DELETE FROM items WHERE username = ?", (username,))
+
+    def users(self):
+        return [r[0] for r in self._conn().execute("SELECT username FROM users")]
+
+    def has_user(self, username):
+        return self._conn().execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is not None
+
+    def check_password(self, username, password):
+        row = self._conn().execute("SELECT password FROM users WHERE username = ?", (username,)).fetchone()
+        return row is not None and verify_password(row[0], password)
+
+    def get_list(self, username, kind):
+        rows = self._conn().execute(
+            "SELECT product FROM items WHERE username = ? AND kind = ? ORDER BY seq", (username, kind),
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def count(self, username, kind):
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM items WHERE username = ? AND kind = ?", (username, kind),
+        ).fetchone()[0]
+
+    def add_item(self, username, kind, product):
+        if not product:
+            return False
+        with self._write() as conn:
+            if conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is None:
+                return False
+            if kind in UNIQUE_KINDS and conn.execute(
+                "SELECT 1 FROM items WHERE username = ? AND kind = ? AND product = ?", (username, kind, product),
+            ).fetchone():
+                return False
+            conn.execute("INSERT INTO items (username, kind, product) VALUES (?, ?, ?)", (username, kind, product))
+            return True
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def make_store(url):
+    # "memory" or "sqlite:///path/to/file.db"
+    if url == "memory":
+        return MemoryStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unknown session store: {url!r} (use 'memory' or 'sqlite:///path')")
@@ -0,0 +1,225 @@
+import csv
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import config
+from loader import Baskets
+from recommender import ShardedIndex, build_rec_index
+
+MODES = ("category", "hierarchical")
+CROSS = "*"  # the cross-category shard in "category" mode
+
+
+def load_categories(path=config.PRODUCTS_PATH):
+    # product name -> category from products.csv.
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return {row["product_name"]: row.get("category") or "" for row in csv.DictReader(f)}
+
+
+class Sharding:
+    # Mines frequent itemsets per category shard instead of over the whole
+    # catalog.
+    #
+    # "category": one shard per category (itemsets whose products all share
+    #     a category) plus one cross-category shard holding product pairs
+    #     from two different categories. Cross-category itemsets of three
+    #     or more products are not mined.
+    # "hierarchical": categories are mined first, as if every basket were
+    #     the set of its products' categories. Only frequent categories get
+    #     a shard, and only frequent category sets A|B|... get a shard of
+    #     itemsets that span exactly those categories. A product itemset
+    #     can't be more frequent than its categories, so nothing in the
+    #     skipped shards could have been frequent, and the union is the
+    #     flat mine's itemsets.
+    #
+    # Each shard is mined over its own columns and only the baskets that
+    # can hold its itemsets, with supports still relative to every basket.
+    # Every subset of a shard's itemset lives in the same shard or in a
+    # category shard. The rules from the union therefore carry the same
+    # metrics they would get from mining everything at once. Shards are
+    # independent and are mined in parallel.
+
+    def __init__(self, mode, categories):
+        if mode not in MODES:
+            raise ValueError(f"Unknown sharding mode: {mode!r} (choose from {MODES})")
+        self.mode = mode
+        self.categories = dict(categories)
+
+    @classmethod
+    def from_config(cls):
+        if not config.SHARDING:
+            return None
+        return cls(config.SHARDING, load_categories(config.PRODUCTS_PATH))
+
+    def params(self):
+        # What goes into the artifact key: the mode and the category map.
+        digest = hashlib.blake2b(json.dumps(sorted(self.categories.items())).encode(), digest_size=8)
+        return {"mode": self.mode, "categories": digest.hexdigest()}
+
+    def category(self, product):
+        return self.categories.get(product, "")
+
+    def shard_of(self, products):
+        # The shard an itemset or rule over `products` belongs to.
+        cats = sorted({self.category(p) for p in products})
+        if len(cats) == 1:
+            return cats[0]
+        return "|".join(cats) if self.mode == "hierarchical" else CROSS
+
+    def mine(self, baskets, min_support, miner="auto", max_len=None, workers=1):
+        # Returns (freq_items, stats); freq_items is shaped like (and ordered
+        # as) mine_frequent_itemsets() output.
+        import pandas as pd
+
+        from mining import canonical_order
+
+        n = len(baskets)
+        csc = baskets.matrix.tocsc()
+        cats = [self.category(p) for p in baskets.items]
+        columns = {}
+        for j, c in enumerate(cats):
+            columns.setdefault(c, []).append(j)
+        pairs_allowed = max_len is None or max_len >= 2
+
+        stats = {"sharding": self.mode}
+        tasks = []  # (function, args)
+        if self.mode == "category":
+            for c in sorted(columns):
+                tasks.append((_mine_shard, _shard_args(csc, baskets.items, columns[c], None, n, min_support, miner,
+                                                       max_len)))
+            if pairs_allowed:
+                tasks.append((_mine_cross_pairs, (baskets.matrix, baskets.items, cats, min_support)))
+        else:
+            frequent, spans, n_cat_itemsets, with_category = _frequent_categories(
+                baskets.matrix, cats, min_support, max_len,
+            )
+            stats["category_itemsets"] = n_cat_itemsets
+            for c in frequent:
+                tasks.append((_mine_shard, _shard_args(csc, baskets.items, columns[c], None, n, min_support, miner,
+                                                       max_len)))
+            code = {c: i for i, c in enumerate(sorted(columns))}
+            for span in spans if pairs_allowed else ():
+                # An itemset spanning these categories has a product of
+                # every other category of the set next to each of its
+                # products, so products that rarely share a basket with one
+                # of those categories are left out.
+                sides = [
+                    [j for j in columns[c] if all(with_category[j, code[o]] >= min_support * n for o in span if o != c)]
+                    for c in span
+                ]
+                if all(sides):
+                    tasks.append((_mine_shard, _shard_args(csc, baskets.items, sorted(j for s in sides for j in s),
+                                                           sides, n, min_support, miner, max_len)))
+
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(fn, *args) for fn, args in tasks]
+                parts = [f.result() for f in futures]
+        else:
+            parts = [fn(*args) for fn, args in tasks]
+
+        parts = [p for p in parts if len(p)]
+        if parts:
+            freq_items = canonical_order(pd.concat(parts, ignore_index=True))
+        else:
+            freq_items = pd.DataFrame({"support": np.zeros(0), "itemsets": []})
+        stats["shards_mined"] = len(tasks)
+        return freq_items, stats
+
+    def build_index(self, rules, score_col="confidence"):
+        # One RecIndex per shard. Rules keep their relative order inside a
+        # shard, so score ties break as in an unsharded index.
+        labels = np.array([
+            self.shard_of(a | c) for a, c in zip(rules["antecedents"], rules["consequents"])
+        ], dtype=object)
+        names = sorted(set(labels.tolist()))
+        shards = [build_rec_index(rules[labels == name].reset_index(drop=True), score_col) for name in names]
+        return ShardedIndex(names, shards)
+
+
+def _shard_args(csc, items, cols, span, n, min_support, miner, max_len):
+    # Only the shard's columns and the baskets that can hold its itemsets
+    # are shipped to the worker: baskets touching the columns, or for a
+    # spanning shard (`span`: one column list per category), baskets
+    # touching every side.
+    sub = csc[:, cols].tocsr()
+    if span is None:
+        rows = np.diff(sub.indptr) > 0
+    else:
+        rows = np.ones(sub.shape[0], dtype=bool)
+        for side in span:
+            rows &= sub[:, np.flatnonzero(np.isin(cols, side))].getnnz(axis=1) > 0
+        span = [frozenset(items[j] for j in side) for side in span]
+    return sub[rows], [items[j] for j in cols], span, n, min_support, miner, max_len
+
+
+def _mine_shard(matrix, items, span, n, min_support, miner, max_len):
+    # Frequent itemsets of one shard, supports relative to all n baskets.
+    # With `span` (each category's products), only itemsets holding
+    # products from every category are kept.
+    import pandas as pd
+
+    from mining import MINERS, choose_miner
+
+    rows = matrix.shape[0]
+    local_support = min_support * n / rows if rows else 2.0
+    if local_support > 1.0:
+        return pd.DataFrame({"support": np.zeros(0), "itemsets": []})
+    baskets = Baskets(matrix, items)
+    algorithm = choose_miner(baskets, local_support) if miner == "auto" else miner
+    # A hair under the threshold so float rounding can't drop an itemset
+    # sitting exactly on it; supports are then recomputed as count / n and
+    # the exact threshold applied, as in a global mine.
+    freq_items = MINERS[algorithm](baskets, local_support * (1 - 1e-9), max_len)
+    freq_items["support"] = np.rint(freq_items["support"].to_numpy() * rows) / n
+    keep = freq_items["support"].to_numpy() >= min_support
+    if span is not None:
+        keep &= np.array([all(s & side for side in span) for s in freq_items["itemsets"]], dtype=bool)
+    return freq_items[keep].reset_index(drop=True)
+
+
+def _mine_cross_pairs(matrix, items, cats, min_support):
+    # Frequent product pairs whose products sit in different categories,
+    # counted with one sparse product over the frequent products.
+    import pandas as pd
+
+    n = matrix.shape[0]
+    counts = np.asarray(matrix.sum(axis=0)).ravel()
+    frequent = np.flatnonzero(counts >= min_support * n) if n else np.zeros(0, dtype=np.int64)
+    x = matrix[:, frequent].astype(np.int32)
+    co = (x.T @ x).tocoo()
+    code = {c: i for i, c in enumerate(sorted(set(cats)))}
+    cat = np.array([code[cats[j]] for j in frequent], dtype=np.int64)
+    keep = (co.row < co.col) & (co.data / n >= min_support) & (cat[co.row] != cat[co.col])
+    return pd.DataFrame({
+        "support": co.data[keep].astype(np.float64) / n,
+        "itemsets": [frozenset((items[frequent[i]], items[frequent[j]])) for i, j in zip(co.row[keep], co.col[keep])],
+    })
+
+
+def _frequent_categories(matrix, cats, min_support, max_len=None):
+    # Category-level mining: each basket becomes the set of its products'
+    # categories. Returns the frequent categories, the frequent category
+    # sets of two or more, the number of frequent category itemsets and,
+    # per product and category, how many baskets hold both (dense,
+    # products x categories).
+    from scipy import sparse
+
+    from mining import mine_frequent_itemsets
+
+    names = sorted(set(cats))
+    code = {c: i for i, c in enumerate(names)}
+    n_items = len(cats)
+    membership = sparse.csr_matrix(
+        (np.ones(n_items, dtype=np.int32), [code[c] for c in cats], np.arange(n_items + 1)),
+        shape=(n_items, len(names)),
+    )
+    category_matrix = (matrix.astype(np.int32) @ membership).astype(bool).tocsr()
+    category_matrix.sort_indices()
+    freq = mine_frequent_itemsets(Baskets(category_matrix, names), min_support, max_len=max_len)
+    sets = [sorted(s) for s in freq["itemsets"]]
+    with_category = (matrix.T.astype(np.int32) @ category_matrix.astype(np.int32)).toarray()
+    return [s[0] for s in sets if len(s) == 1], [tuple(s) for s in sets if len(s) >= 2], len(sets), with_category
@@ -0,0 +1,234 @@
+import argparse
+import hashlib
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+import config
+import metrics
+
+
+def row_dtype(k):
+    return np.dtype([("ids", np.int32, (k,)), ("scores", np.float32, (k,)), ("flags", np.uint8, (k,))])
+
+
+class TopKTable:
+    # Single-product recommendations for every catalog product, computed
+    # ahead of time: one fixed-width record per product, in products.csv
+    # order.
+    #
+    #   ids     catalog positions of the top k recommendations, -1 padded
+    #   scores  their rule scores (float32)
+    #   flags   each recommendation's badge bits (catalog.HOT / POPULAR)
+    #
+    # A lookup reads one record. The records are a plain .npy file next to
+    # the model artifact, and load() maps it read-only, so every process
+    # serving the same model shares the pages. The flags stored there are a
+    # snapshot from build time: each process copies them into its own small
+    # `flags` array (1 byte per entry) and patches badges there, never in
+    # the shared records.
+
+    def __init__(self, key, names, rows):
+        self.key = key  # the model key the table was built from
+        self.names = list(names)
+        self.ids = {n: i for i, n in enumerate(self.names)}
+        self.rows = rows
+        self.k = rows.dtype["ids"].shape[0]
+        # Plain ndarray views of the fields: indexing an np.memmap goes
+        # through its subclass hooks on every read.
+        plain = np.asarray(rows).view(np.ndarray)
+        self._ids, self._scores = plain["ids"], plain["scores"]
+        self.flags = np.array(plain["flags"], dtype=np.uint8)
+        # Where each product is recommended, as positions into the flattened
+        # flags: those of product p are _where[_where_offsets[p]:_where_offsets[p + 1]].
+        flat = self._ids.ravel()
+        recommended = np.flatnonzero(flat >= 0)
+        self._where = recommended[np.argsort(flat[recommended], kind="stable")]
+        self._where_offsets = np.zeros(len(self.names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(flat[recommended], minlength=len(self.names)), out=self._where_offsets[1:])
+        # row() decodes a record's ids and scores with one unpack from the
+        # mapped bytes.
+        self._record = struct.Struct(f"={self.k}i{self.k}f")
+        self._stride = rows.dtype.itemsize
+        self._buffer = memoryview(plain.view(np.uint8)) if len(plain) else b""
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes
+
+    @classmethod
+    def build(cls, rec_index, catalog, k=4, key=None):
+        # Ranked like recommend(): the index's top k, minus products that
+        # are not in the catalog.
+        names = catalog.names
+        position = {n: i for i, n in enumerate(names)}
+        to_catalog = np.array([position.get(n, -1) for n in rec_index.names], dtype=np.int32)
+        q, targets, scores, _, _ = rec_index.lookup_many(names, k)
+        targets = to_catalog[targets] if len(targets) else np.zeros(0, dtype=np.int32)
+        keep = targets >= 0
+        q, targets, scores = q[keep], targets[keep], scores[keep]
+        starts = np.r_[0, np.flatnonzero(q[1:] != q[:-1]) + 1] if len(q) else np.zeros(0, dtype=np.int64)
+        col = np.arange(len(q)) - np.repeat(starts, np.diff(np.r_[starts, len(q)]))
+
+        rows = np.zeros(len(names), dtype=row_dtype(k))
+        rows["ids"] = -1
+        rows["ids"][q, col] = targets
+        rows["scores"][q, col] = scores
+        flags = product_flags(catalog)
+        rows["flags"][q, col] = flags[targets]
+        return cls(key, names, rows)
+
+    def row(self, product):
+        # (names, scores, badge flags) of the product's recommendations,
+        # or None for a product the table does not cover.
+        i = self.ids.get(product)
+        if i is None:
+            return None
+        k = self.k
+        rec = self._record.unpack_from(self._buffer, i * self._stride)
+        if rec[0] < 0:
+            return [], [], []
+        ids = rec[:k]
+        n = ids.index(-1) if -1 in ids else k
+        names = self.names
+        return [names[j] for j in ids[:n]], list(rec[k:k + n]), self.flags[i, :n].tolist()
+
+    def set_badge(self, product, flags):
+        # Rewrites the badge bits wherever `product` is recommended.
+        i = self.ids.get(product)
+        if i is None:
+            return
+        self.flags.reshape(-1)[self._where[self._where_offsets[i]:self._where_offsets[i + 1]]] = flags
+
+    def sync_badges(self, catalog):
+        # Brings every badge up to the catalog's counters, writing only the
+        # entries that differ.
+        ids = self._ids
+        current = np.where(ids >= 0, product_flags(catalog)[ids], 0).astype(np.uint8)
+        rows, cols = np.nonzero(self.flags != current)
+        if len(rows):
+            self.flags[rows, cols] = current[rows, cols]
+
+    def save(self, path):
+        # Written under a scratch name and renamed into place.
+        tmp = f"{path}.tmp{os.getpid()}"
+        with open(tmp, "wb") as f:
+            np.save(f, self.rows)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, path, key, names, mmap=True):
+        rows = np.load(path, mmap_mode="r" if mmap else None)
+        if len(rows) != len(names):
+            raise ValueError(f"{path} has {len(rows)} rows for {len(names)} products")
+        return cls(key, names, rows)
+
+
+def product_flags(catalog):
+    return np.array([catalog.badge_flags(n) for n in catalog.names], dtype=np.uint8)
+
+
+def table_path(root, model_key, names, k):
+    # Inside the model's artifact directory, so it goes away with the
+    # artifact. The name carries the catalog, since rows follow its order.
+    digest = hashlib.blake2b("\n".join(names).encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(root, model_key, f"topk_{k}_{digest}.npy")
+
+
+def load_or_build_table(model, catalog, k=4, root=config.MODEL_DIR):
+    # Maps the table written by any process serving this model, or builds
+    # it and writes it next to the artifact (a model that was never saved
+    # keeps its table in memory).
+    path = table_path(root, model.key, catalog.names, k)
+    try:
+        table = TopKTable.load(path, model.key, catalog.names)
+    except (OSError, ValueError):
+        table = None
+    if table is None:
+        with metrics.timed("topk_build"):
+            table = TopKTable.build(model.rec_index, catalog, k, model.key)
+        if os.path.isdir(os.path.dirname(path)):
+            try:
+                table.save(path)
+                table = TopKTable.load(path, model.key, catalog.names)
+            except OSError:
+                pass
+    return table
+
+
+class TopKServer:
+    # The table for the model being served. After every model swap, a
+    # background thread loads or builds the new model's table; until it
+    # is in, `table` still belongs to the old model and recommend() falls
+    # back to the index (it checks table.key).
+
+    def __init__(self, catalog, k=4, root=config.MODEL_DIR):
+        self.catalog = catalog
+        self.k = k
+        self.root = root
+        self.table = None
+        self.last_error = None
+        self._wanted = None
+        self._lock = threading.Lock()
+
+    def model_swapped(self, old, new):
+        # A models.listeners callback.
+        if new is None:
+            return
+        self._wanted = new
+        threading.Thread(target=self.refresh, args=(new,), name="topk-builder", daemon=True).start()
+
+    def refresh(self, model):
+        with self._lock:
+            if model is not self._wanted and self._wanted is not None:
+                return None  # a newer model arrived while this one waited
+            try:
+                table = load_or_build_table(model, self.catalog, self.k, self.root)
+            except Exception as e:
+                self.last_error = e
+                return None
+            self.table = table
+            # The stored flags date from the build; bringing them up to the
+            # catalog after the swap also catches badges that changed during
+            # the build (those went to the old table).
+            table.sync_badges(self.catalog)
+            return table
+
+    def badge_changed(self, product):
+        # A catalog.badge_listeners callback.
+        table = self.table
+        if table is not None and product in self.catalog:
+            table.set_badge(product, self.catalog.badge_flags(product))
+
+
+def main(argv=None):
+    from catalog import Catalog
+    from model_store import load_or_build_model
+
+    parser = argparse.ArgumentParser(description="Build the precomputed top-k table for the current model.")
+    parser.add_argument("--products", default=config.PRODUCTS_PATH)
+    parser.add_argument("--model-dir", default=config.MODEL_DIR)
+    parser.add_argument("-k", type=int, default=4, help="recommendations per product")
+    args = parser.parse_args(argv)
+
+    catalog = Catalog.from_csv(args.products)
+    model = load_or_build_model(root=args.model_dir)
+    start = time.perf_counter()
+    path = table_path(args.model_dir, model.key, catalog.names, args.k)
+    if os.path.exists(path):
+        os.remove(path)
+    table = load_or_build_table(model, catalog, args.k, args.model_dir)
+    filled = int((np.asarray(table.rows["ids"])[:, 0] >= 0).sum())
+    print(f"{len(table)} products ({filled} with recommendations), {table.nbytes / 1024:.1f} KB, "
+          f"built in {time.perf_counter() - start:.2f}s -> {path}")
+
+
+if __name__ == "__main__":
+    main()